@@ -1,11 +1,48 @@
 from __future__ import absolute_import
 
 from django.contrib import admin
+from django.utils.translation import ugettext_lazy as _, ungettext
 
-from .models import Plugin
+from .models import Plugin, PluginScopeStatus, ENABLED, DISABLED
+
+
+class PluginScopeStatusInline(admin.TabularInline):
+    model = PluginScopeStatus
+    extra = 0
 
 
 class PluginAdmin(admin.ModelAdmin):
-    list_display = ('title', 'index', 'status')
+    list_display = ('title', 'point', 'index', 'status')
+    list_display_links = ('title',)
+    list_editable = ('index',)
     list_filter = ('point', 'status')
+    list_select_related = ('point',)
+    list_per_page = 100
+    show_full_result_count = False
+    actions = ['enable_plugins', 'disable_plugins', 'reorder_plugins']
+    inlines = [PluginScopeStatusInline]
+
+    def _set_status(self, request, queryset, status, message):
+        count = Plugin.objects.set_status(queryset, status)
+        self.message_user(request, message(count) % {'count': count})
+
+    def enable_plugins(self, request, queryset):
+        self._set_status(request, queryset, ENABLED, lambda count: ungettext(
+            '%(count)d plugin was enabled.',
+            '%(count)d plugins were enabled.', count))
+    enable_plugins.short_description = _('Enable selected plugins')
+
+    def disable_plugins(self, request, queryset):
+        self._set_status(request, queryset, DISABLED, lambda count: ungettext(
+            '%(count)d plugin was disabled.',
+            '%(count)d plugins were disabled.', count))
+    disable_plugins.short_description = _('Disable selected plugins')
+
+    def reorder_plugins(self, request, queryset):
+        count = Plugin.objects.reorder(queryset)
+        self.message_user(request, ungettext(
+            'Order of %(count)d plugin was changed.',
+            'Order of %(count)d plugins was changed.', count) %
+            {'count': count})
+    reorder_plugins.short_description = _('Renumber order of selected plugins')
 admin.site.register(Plugin, PluginAdmin)
@@ -1,6 +1,21 @@
 from django.apps import AppConfig
+from django.db import DatabaseError
+
+from .utils import get_setting
 
 
 class DjangoPluginsConfig(AppConfig):
     name = 'djangoplugins'
     verbose_name = "Django Plugins"
+
+    def ready(self):
+        from . import checks  # noqa
+        from .registry import registry
+
+        if registry.is_enabled() and get_setting('WARM_UP', False):
+            try:
+                registry.warm_up()
+            except DatabaseError:
+                # Database is not available or not migrated yet, registry
+                # will be loaded on first use.
+                registry.clear()
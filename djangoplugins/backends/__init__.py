@@ -0,0 +1,32 @@
+from __future__ import absolute_import
+
+from ..utils import get_setting, get_plugin_from_string
+
+DEFAULT_BACKEND = 'djangoplugins.backends.orm.ORMBackend'
+
+_backends = {}
+_overrides = []
+
+
+def get_backend():
+    """
+    Returns plugin state storage backend, configured with
+    ``DJANGOPLUGINS_BACKEND`` setting, or the one activated by
+    ``override_backend``.
+    """
+    if _overrides:
+        return _overrides[-1]
+    path = get_setting('BACKEND', DEFAULT_BACKEND)
+    try:
+        return _backends[path]
+    except KeyError:
+        backend = _backends[path] = get_plugin_from_string(path)()
+        return backend
+
+
+def push_backend(backend):
+    _overrides.append(backend)
+
+
+def pop_backend():
+    return _overrides.pop()
@@ -0,0 +1,113 @@
+from __future__ import absolute_import
+
+from ..models import Plugin, ScopeStatus, ENABLED, REMOVED
+
+
+class BaseBackend(object):
+    """
+    Storage of plugin state.
+
+    Backends return plugins as ``PluginRecord`` objects. Subclasses must
+    implement ``get_rows``, other read methods fall back to filtering its
+    result.
+    """
+
+    def get_rows(self, pythonpaths=None):
+        """
+        Returns ``(point pythonpath, PluginRecord)`` pairs of all plugins, or
+        of plugins with given ``pythonpaths``, ordered by index.
+        """
+        raise NotImplementedError
+
+    def get_scope_rows(self, scope):
+        """
+        Returns ``(plugin id, status)`` pairs of status overrides of
+        ``scope``.
+        """
+        return []
+
+    def get_records(self, point, scope=None):
+        """
+        Returns ordered list of records of enabled plugins of ``point``
+        pythonpath, within ``scope``, if given.
+        """
+        return self.get_records_for([point], scope)[point]
+
+    def get_records_for(self, points, scope=None):
+        """
+        Same as ``get_records``, but for several plugin point pythonpaths at
+        once. Returns dict of record lists by point pythonpath.
+        """
+        records = dict((point, []) for point in points)
+        rows = [(point, record) for point, record in self.get_rows()
+                if point in records and record.status != REMOVED]
+        if scope is None:
+            rows = [(point, record) for point, record in rows
+                    if record.status == ENABLED]
+        else:
+            positions = dict((record.id, i)
+                             for i, (point, record) in enumerate(rows))
+            scope_status = ScopeStatus(positions, self.get_scope_rows(scope))
+            rows = [(point, record) for point, record in rows
+                    if scope_status.is_enabled(record)]
+        for point, record in rows:
+            records[point].append(record)
+        return records
+
+    def get_record(self, pythonpath):
+        """
+        Returns record of plugin by pythonpath, regardless of status.
+        """
+        for point_pythonpath, record in self.get_rows([pythonpath]):
+            return record
+        raise Plugin.DoesNotExist(pythonpath)
+
+    def get_record_by_name(self, point, name, status=ENABLED):
+        """
+        Returns record of plugin of ``point`` pythonpath by name. If
+        ``status`` is ``None``, plugin may have any status.
+        """
+        for point_pythonpath, record in self.get_rows():
+            if point_pythonpath == point and record.name == name and \
+                    (status is None or record.status == status):
+                return record
+        raise Plugin.DoesNotExist(name)
+
+    def get_model(self, pythonpath, name=None, status=ENABLED):
+        """
+        Returns model of plugin by pythonpath or, if ``name`` is given, of
+        plugin of point ``pythonpath`` by name. Backends, which do not store
+        plugins in database, return records instead.
+        """
+        if name is None:
+            return self.get_record(pythonpath)
+        return self.get_record_by_name(pythonpath, name, status)
+
+    def get_point_model(self, pythonpath):
+        """
+        Returns model of plugin point by pythonpath.
+        """
+        raise NotImplementedError('%s does not store plugin points.' %
+                                  type(self).__name__)
+
+    def get_last_seq(self):
+        """
+        Returns sequence number of the last plugin change or ``None``, if
+        backend does not log changes.
+        """
+        return None
+
+    def get_changes(self, seq, limit):
+        """
+        Returns at most ``limit`` ``(seq, pythonpath, action)`` changes after
+        ``seq`` or ``None``, if backend does not log changes.
+        """
+        return None
+
+    def sync(self, verbosity=1, delete_removed=False, chunk_size=None,
+             **options):
+        """
+        Synchronizes registered plugins to the storage. Backends may accept
+        additional ``options`` of ``syncplugins`` command and ignore the rest.
+        """
+        pass
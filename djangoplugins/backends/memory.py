@@ -0,0 +1,104 @@
+from __future__ import absolute_import
+
+from django.utils import six
+
+from ..models import PluginRecord, ENABLED, DISABLED
+from ..utils import get_plugin_name, load_plugins
+from .base import BaseBackend
+
+
+def get_pythonpath(plugin):
+    if isinstance(plugin, six.string_types):
+        return plugin
+    return get_plugin_name(plugin)
+
+
+class MemoryBackend(BaseBackend):
+    """
+    Keeps plugin state in memory, seeded from registered plugin classes.
+    Intended for tests, so plugins can be enabled, disabled and reordered
+    without touching database::
+
+        backend = MemoryBackend()
+        backend.disable(MyPlugin)
+        backend.set_index(MyOtherPlugin, -1)
+        backend.disable(MyPlugin, scope='site:1')
+
+    """
+
+    def __init__(self):
+        self.rows = []
+        self.scopes = {}
+        self.sync()
+
+    def changed(self):
+        from ..registry import bump_version
+
+        bump_version()
+
+    def sync(self, verbosity=1, delete_removed=False, chunk_size=None,
+             **options):
+        from ..point import PluginMount
+
+        load_plugins()
+        existing = dict((record.pythonpath, record)
+                        for point_pythonpath, record in self.rows)
+        last_id = max([record.id for record in existing.values()] or [0])
+        rows = []
+        for point in PluginMount.points:
+            for plugin in point.plugins:
+                pythonpath = get_plugin_name(plugin)
+                record = existing.get(pythonpath)
+                if record is None:
+                    last_id += 1
+                title = getattr(plugin, 'title', None)
+                rows.append((get_plugin_name(point), PluginRecord(
+                    record.id if record else last_id,
+                    pythonpath,
+                    getattr(plugin, 'name', None),
+                    six.text_type(title) if title is not None else '',
+                    record.index if record else 0,
+                    record.status if record else ENABLED,
+                )))
+        self.set_rows(rows)
+
+    def set_rows(self, rows):
+        self.rows = sorted(rows, key=lambda row: (row[1].index, row[1].id))
+        self.changed()
+
+    def get_rows(self, pythonpaths=None):
+        if pythonpaths is None:
+            return list(self.rows)
+        return [row for row in self.rows if row[1].pythonpath in pythonpaths]
+
+    def get_scope_rows(self, scope):
+        return list(six.iteritems(self.scopes.get(scope, {})))
+
+    def update(self, plugin, **kwargs):
+        pythonpath = get_pythonpath(plugin)
+        rows = []
+        for point_pythonpath, record in self.rows:
+            if record.pythonpath == pythonpath:
+                values = dict((i, getattr(record, i))
+                              for i in PluginRecord.fields)
+                values.update(kwargs)
+                record = PluginRecord(**values)
+            rows.append((point_pythonpath, record))
+        self.set_rows(rows)
+
+    def set_status(self, plugin, status, scope=None):
+        if scope is None:
+            self.update(plugin, status=status)
+            return
+        record = self.get_record(get_pythonpath(plugin))
+        self.scopes.setdefault(scope, {})[record.id] = status
+        self.changed()
+
+    def enable(self, plugin, scope=None):
+        self.set_status(plugin, ENABLED, scope)
+
+    def disable(self, plugin, scope=None):
+        self.set_status(plugin, DISABLED, scope)
+
+    def set_index(self, plugin, index):
+        self.update(plugin, index=index)
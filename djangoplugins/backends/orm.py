@@ -0,0 +1,86 @@
+from __future__ import absolute_import
+
+from django import VERSION as django_version
+
+from ..models import Plugin, PluginPoint, PluginRecord, PluginScopeStatus, \
+    PluginChange, ENABLED, get_record_fields
+from ..utils import db_table_exists
+from .base import BaseBackend
+
+
+class ORMBackend(BaseBackend):
+    """
+    Default backend, storing plugin state in ``Plugin`` and ``PluginPoint``
+    tables.
+    """
+
+    def get_rows(self, pythonpaths=None):
+        if not db_table_exists(Plugin._meta.db_table) or \
+                not db_table_exists(PluginPoint._meta.db_table):
+            return []
+        qs = Plugin.objects.order_by('index', 'id')
+        if pythonpaths is not None:
+            qs = qs.filter(pythonpath__in=pythonpaths)
+        qs = qs.values_list('point__pythonpath', *get_record_fields())
+        return [(row[0], PluginRecord(*row[1:])) for row in qs]
+
+    def get_scope_rows(self, scope):
+        return PluginScopeStatus.objects.filter(scope=scope).\
+            values_list('plugin_id', 'status')
+
+    def get_records_for(self, points, scope=None):
+        # Django >= 1.9 changed something with the migration logic causing
+        # plugins to be executed before the corresponding database tables
+        # exist. This method will only return something if the database
+        # tables have already been created.
+        # XXX: I don't fully understand the issue and there should be
+        # another way but this appears to work fine.
+        if django_version >= (1, 9) and \
+                not db_table_exists(Plugin._meta.db_table):
+            return dict((point, []) for point in points)
+        return Plugin.objects.get_records_for(points, scope)
+
+    def get_record(self, pythonpath):
+        qs = Plugin.objects.filter(pythonpath=pythonpath).\
+            values_list(*get_record_fields())
+        for row in qs:
+            return PluginRecord(*row)
+        raise Plugin.DoesNotExist(pythonpath)
+
+    def get_record_by_name(self, point, name, status=ENABLED):
+        qs = Plugin.objects.filter(point__pythonpath=point, name=name)
+        if status is not None:
+            qs = qs.filter(status=status)
+        for row in qs.values_list(*get_record_fields()):
+            return PluginRecord(*row)
+        raise Plugin.DoesNotExist(name)
+
+    def get_model(self, pythonpath, name=None, status=ENABLED):
+        if name is None:
+            return Plugin.objects.get(pythonpath=pythonpath)
+        kwargs = {}
+        if status is not None:
+            kwargs['status'] = status
+        return Plugin.objects.get(point__pythonpath=pythonpath, name=name,
+                                  **kwargs)
+
+    def get_point_model(self, pythonpath):
+        return PluginPoint.objects.get(pythonpath=pythonpath)
+
+    def get_last_seq(self):
+        if PluginChange.objects.is_enabled() and \
+                db_table_exists(PluginChange._meta.db_table):
+            return PluginChange.objects.last_seq()
+        return None
+
+    def get_changes(self, seq, limit):
+        if not PluginChange.objects.is_enabled():
+            return None
+        return list(PluginChange.objects.since(seq).
+                    values_list('seq', 'pythonpath', 'action')[:limit])
+
+    def sync(self, verbosity=1, delete_removed=False, chunk_size=None,
+             **options):
+        from ..management.commands.syncplugins import SyncPlugins
+
+        SyncPlugins(delete_removed, verbosity, chunk_size, **options).all()
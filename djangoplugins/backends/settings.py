@@ -0,0 +1,65 @@
+from __future__ import absolute_import
+
+import json
+
+from django.utils import six
+
+from ..models import PluginRecord
+from ..utils import get_setting
+from .memory import MemoryBackend
+
+
+class SettingsBackend(MemoryBackend):
+    """
+    Read-only backend, seeded from registered plugin classes and plugin
+    state given by ``DJANGOPLUGINS_STATE`` setting, in the format of
+    ``dumpplugins`` command output. The setting is either a dict or path to
+    a JSON file::
+
+        DJANGOPLUGINS_STATE = {
+            'plugins': {
+                'my_app.plugins.MyPlugin': {'status': DISABLED},
+                'my_app.plugins.MyOtherPlugin': {
+                    'index': -1, 'scopes': {'site:1': DISABLED}},
+            },
+        }
+
+    ``index``, ``status``, ``config`` and ``scopes`` of plugins are applied,
+    plugins missing in state are enabled. State is read again on
+    ``syncplugins``.
+    """
+
+    def get_state(self):
+        state = get_setting('STATE', {})
+        if isinstance(state, six.string_types):
+            with open(state) as f:
+                state = json.load(f)
+        return state
+
+    def sync(self, verbosity=1, delete_removed=False, chunk_size=None,
+             **options):
+        super(SettingsBackend, self).sync(verbosity)
+        plugins = self.get_state().get('plugins', {})
+        rows = []
+        scopes = {}
+        for point_pythonpath, record in self.rows:
+            state = plugins.get(record.pythonpath, {})
+            values = dict((i, getattr(record, i))
+                          for i in PluginRecord.fields)
+            values.update((i, state[i]) for i in ('index', 'status')
+                          if i in state)
+            config = state.get('config', record.config)
+            if not isinstance(config, six.string_types):
+                config = json.dumps(config)
+            values['config'] = config
+            rows.append((point_pythonpath, PluginRecord(**values)))
+            for scope, status in six.iteritems(state.get('scopes', {})):
+                scopes.setdefault(scope, {})[record.id] = status
+        self.scopes = scopes
+        self.set_rows(rows)
+
+    def update(self, plugin, **kwargs):
+        raise TypeError('%s is read-only.' % type(self).__name__)
+
+    def set_status(self, plugin, status, scope=None):
+        raise TypeError('%s is read-only.' % type(self).__name__)
@@ -0,0 +1,194 @@
+from __future__ import absolute_import
+
+import logging
+import threading
+import time
+
+from .registry import get_version
+from .utils import get_setting, get_plugin_name
+
+logger = logging.getLogger('djangoplugins')
+
+DEFAULTS = {
+    'threshold': 0.5,
+    'min_calls': 10,
+    'slow': None,
+    'window': 60,
+    'cooldown': 30,
+}
+
+
+class CircuitBreaker(object):
+    """
+    In-memory error rate of one plugin.
+
+    Failed calls and calls slower than ``slow`` seconds, if given, count as
+    failures. When at least ``min_calls`` calls were made within ``window``
+    seconds and ``threshold`` of them failed, breaker opens and the plugin is
+    skipped for ``cooldown`` seconds. Then one call is let through, and
+    breaker closes, if it succeeds, or stays open for another ``cooldown``.
+    """
+
+    def __init__(self, threshold, min_calls, slow, window, cooldown):
+        self.threshold = threshold
+        self.min_calls = min_calls
+        self.slow = slow
+        self.window = window
+        self.cooldown = cooldown
+        self.lock = threading.Lock()
+        self.opened = None
+        self.reset_counts(time.time())
+
+    def reset_counts(self, now):
+        self.started = now
+        self.calls = 0
+        self.failures = 0
+        self.total = 0.0
+
+    def is_open(self):
+        return self.opened is not None
+
+    def allow(self):
+        """
+        Returns if plugin may be called now.
+        """
+        with self.lock:
+            if self.opened is None:
+                return True
+            now = time.time()
+            if now - self.opened < self.cooldown:
+                return False
+            # Let one call through, others wait for next cooldown.
+            self.opened = now
+            return True
+
+    def record(self, success, duration):
+        if self.slow is not None and duration > self.slow:
+            success = False
+        now = time.time()
+        with self.lock:
+            if now - self.started > self.window:
+                self.reset_counts(now)
+            self.calls += 1
+            self.total += duration
+            if not success:
+                self.failures += 1
+            if self.opened is not None:
+                if success:
+                    self.opened = None
+                    self.reset_counts(now)
+                else:
+                    self.opened = now
+            elif self.calls >= self.min_calls and \
+                    self.failures >= self.threshold * self.calls:
+                self.opened = now
+
+    def get_state(self):
+        return {
+            'open': self.is_open(),
+            'calls': self.calls,
+            'failures': self.failures,
+            'mean': self.total / self.calls if self.calls else 0.0,
+        }
+
+
+class Breakers(object):
+    """
+    Process wide circuit breakers of plugins, enabled with
+    ``DJANGOPLUGINS_BREAKER`` setting, a dict of ``CircuitBreaker``
+    arguments (or ``True`` for defaults). All breakers are reset, when plugin
+    registry version changes.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.breakers = {}
+        self.version = None
+
+    def is_enabled(self):
+        return bool(get_setting('BREAKER'))
+
+    def get_options(self):
+        options = dict(DEFAULTS)
+        config = get_setting('BREAKER')
+        if isinstance(config, dict):
+            options.update(config)
+        return options
+
+    def reset(self):
+        with self.lock:
+            self.breakers = {}
+
+    def check_version(self):
+        """
+        Resets all breakers, if registry version changed. Called once for
+        each ``dispatch()``, as reading the version is a cache round-trip.
+        """
+        version = get_version()
+        with self.lock:
+            if self.version != version:
+                self.breakers = {}
+                self.version = version
+
+    def get(self, pythonpath):
+        with self.lock:
+            try:
+                return self.breakers[pythonpath]
+            except KeyError:
+                breaker = self.breakers[pythonpath] = \
+                    CircuitBreaker(**self.get_options())
+                return breaker
+
+    def get_state(self):
+        """
+        Returns state of breakers by plugin pythonpath.
+        """
+        self.check_version()
+        with self.lock:
+            items = list(self.breakers.items())
+        return dict((pythonpath, breaker.get_state())
+                    for pythonpath, breaker in items)
+
+
+breakers = Breakers()
+
+
+def dispatch(plugins, method, args=(), kwargs=None, budget=None):
+    """
+    Calls ``method`` of each of ``plugins`` and returns list of
+    ``(plugin, result)`` pairs.
+
+    When circuit breakers are enabled, plugins with open breaker are
+    skipped and exceptions are logged, instead of being raised. If
+    ``budget`` seconds are spent, remaining plugins are skipped.
+    """
+    kwargs = kwargs or {}
+    enabled = breakers.is_enabled()
+    if enabled:
+        breakers.check_version()
+    start = time.time()
+    results = []
+    for plugin in plugins:
+        if budget is not None and time.time() - start >= budget:
+            logger.warning('Latency budget of %s exhausted, skipping '
+                           'remaining plugins.', method)
+            break
+        breaker = None
+        if enabled:
+            breaker = breakers.get(get_plugin_name(type(plugin)))
+            if not breaker.allow():
+                continue
+        call_start = time.time()
+        try:
+            result = getattr(plugin, method)(*args, **kwargs)
+        except Exception:
+            if breaker is None:
+                raise
+            breaker.record(False, time.time() - call_start)
+            logger.exception('Plugin %s failed.',
+                             get_plugin_name(type(plugin)))
+            continue
+        if breaker is not None:
+            breaker.record(True, time.time() - call_start)
+        results.append((plugin, result))
+    return results
@@ -0,0 +1,132 @@
+from __future__ import absolute_import
+
+import hashlib
+from collections import namedtuple
+
+try:
+    from django.core import checks
+except ImportError:  # Django < 1.7
+    checks = None
+from django.core.exceptions import ImproperlyConfigured
+from django.utils import six, translation
+from django.utils.encoding import force_bytes
+
+from .models import Plugin, PluginPoint, REMOVED
+from .point import PluginMount
+from .utils import get_plugin_name, load_plugins, db_column_exists
+
+
+RegistryDifference = namedtuple('RegistryDifference',
+                                ['kind', 'pythonpath', 'message'])
+
+
+def get_plugin_meta(plugin):
+    """
+    Returns ``(name, title)`` of plugin class, as stored by ``syncplugins``.
+    """
+    title = getattr(plugin, 'title', None)
+    if title is not None:
+        title = six.text_type(title)
+    return getattr(plugin, 'name', None), title
+
+
+def get_point_fingerprint(point):
+    """
+    Returns fingerprint of plugin point class, which changes when a plugin of
+    this point is added, removed, renamed or retitled in code.
+    """
+    with translation.override(None):
+        items = sorted('%s\t%s\t%s' % ((get_plugin_name(plugin),) +
+                                       get_plugin_meta(plugin))
+                       for plugin in point.plugins)
+    return hashlib.sha1(force_bytes('\n'.join(items))).hexdigest()
+
+
+def compare_plugins(points):
+    """
+    Compares plugins of given plugin point classes with database.
+    """
+    differences = []
+    rows = Plugin.objects.filter(
+        point__pythonpath__in=[get_plugin_name(i) for i in points]).\
+        exclude(status=REMOVED).values_list('pythonpath', 'name', 'title')
+    db = dict((row[0], row[1:]) for row in rows)
+    for point in points:
+        for plugin in point.plugins:
+            pythonpath = get_plugin_name(plugin)
+            name, title = get_plugin_meta(plugin)
+            if pythonpath not in db:
+                differences.append(RegistryDifference(
+                    'missing', pythonpath,
+                    'Plugin %s is not synced to database.' % pythonpath))
+                continue
+            db_name, db_title = db.pop(pythonpath)
+            if name != db_name or (title is not None and title != db_title):
+                differences.append(RegistryDifference(
+                    'renamed', pythonpath,
+                    'Plugin %s was renamed or retitled.' % pythonpath))
+    for pythonpath in db:
+        differences.append(RegistryDifference(
+            'removed', pythonpath,
+            'Plugin %s was removed from code, but not from database.' %
+            pythonpath))
+    return differences
+
+
+def check_registry():
+    """
+    Compares registered plugin points and plugins with database, using
+    fingerprints stored by ``syncplugins``. Returns list of
+    ``RegistryDifference``, which is empty, when database is in sync.
+
+    When all fingerprints match, only one query is made.
+    """
+    load_plugins()
+    src = dict((get_plugin_name(point), point) for point in PluginMount.points)
+    dst = dict(PluginPoint.objects.exclude(status=REMOVED).
+               values_list('pythonpath', 'fingerprint'))
+
+    differences = []
+    changed = []
+    for pythonpath, point in six.iteritems(src):
+        if pythonpath not in dst:
+            differences.append(RegistryDifference(
+                'missing', pythonpath,
+                'Plugin point %s is not synced to database.' % pythonpath))
+        elif dst.pop(pythonpath) != get_point_fingerprint(point):
+            changed.append(point)
+    for pythonpath in dst:
+        differences.append(RegistryDifference(
+            'removed', pythonpath,
+            'Plugin point %s was removed from code, but not from database.' %
+            pythonpath))
+    if changed:
+        differences.extend(compare_plugins(changed))
+    return differences
+
+
+def assert_registry_synced():
+    """
+    Raises ``ImproperlyConfigured`` if database is not in sync with
+    registered plugins. Can be called from ``wsgi.py`` to refuse to start a
+    worker.
+    """
+    differences = check_registry()
+    if differences:
+        raise ImproperlyConfigured(
+            'Plugins are not synced, run syncplugins command:\n%s' %
+            '\n'.join(i.message for i in differences))
+
+
+def registry_check(app_configs=None, **kwargs):
+    # Database checks run before migrate applies migrations, in which case
+    # there is nothing to compare yet.
+    if not db_column_exists(PluginPoint._meta.db_table, 'fingerprint'):
+        return []
+    return [checks.Warning(i.message, hint='Run syncplugins command.',
+                           id='djangoplugins.W001')
+            for i in check_registry()]
+
+
+if checks is not None:
+    checks.register('database')(registry_check)
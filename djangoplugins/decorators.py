@@ -0,0 +1,86 @@
+from __future__ import absolute_import
+
+from functools import wraps
+
+from django.utils import six
+
+from .signals import django_plugin_enabled, django_plugin_disabled, \
+    django_plugins_synced
+from .utils import get_plugin_name, LRUCache
+
+_memoized = []
+_missing = object()
+
+
+def memoize(maxsize=128, ttl=None):
+    """
+    Caches results of a plugin method by plugin pythonpath and arguments.
+
+    At most ``maxsize`` results are kept for each plugin, each for at most
+    ``ttl`` seconds, if given. Cached results of a plugin are cleared, when
+    the plugin is enabled or disabled, and all of them after plugins are
+    synchronized. Calls with unhashable arguments are not cached::
+
+        class MyPlugin(MyPluginPoint):
+            @memoize(maxsize=10, ttl=300)
+            def get_menu(self, language):
+                ...
+
+    Invalidation happens in current process only, use ``ttl`` to limit
+    staleness in other processes.
+    """
+    def decorator(func):
+        caches = {}
+        _memoized.append(caches)
+
+        @wraps(func)
+        def wrapper(self, *args, **kwargs):
+            pythonpath = get_plugin_name(type(self))
+            key = (args, tuple(sorted(six.iteritems(kwargs))))
+            try:
+                hash(key)
+            except TypeError:
+                return func(self, *args, **kwargs)
+            try:
+                cache = caches[pythonpath]
+            except KeyError:
+                cache = caches.setdefault(pythonpath, LRUCache(maxsize, ttl))
+            value = cache.get(key, _missing)
+            if value is _missing:
+                value = func(self, *args, **kwargs)
+                cache.set(key, value)
+            return value
+        return wrapper
+    return decorator
+
+
+def clear_memoized(plugin=None):
+    """
+    Clears results of memoized methods of ``plugin`` class or instance, or
+    of all plugins.
+    """
+    if plugin is None:
+        for caches in _memoized:
+            caches.clear()
+        return
+    if not isinstance(plugin, type):
+        plugin = type(plugin)
+    pythonpath = get_plugin_name(plugin)
+    for caches in _memoized:
+        caches.pop(pythonpath, None)
+
+
+def _plugin_changed(sender, plugin, **kwargs):
+    clear_memoized(plugin)
+
+
+def _plugins_synced(sender, **kwargs):
+    clear_memoized()
+
+
+django_plugin_enabled.connect(_plugin_changed,
+                              dispatch_uid='djangoplugins.memoize.enabled')
+django_plugin_disabled.connect(_plugin_changed,
+                               dispatch_uid='djangoplugins.memoize.disabled')
+django_plugins_synced.connect(_plugins_synced,
+                              dispatch_uid='djangoplugins.memoize.synced')
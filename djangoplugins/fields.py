@@ -1,14 +1,55 @@
 from __future__ import absolute_import
 
 from django import forms
-from django.db import models
+from django.core.exceptions import ValidationError
+from django.db import models, router
+from django.forms.models import ModelChoiceIterator
+from django.utils import six
 
-from .models import Plugin
+from .models import Plugin, PluginRecord
+from .registry import registry
 from .utils import get_plugin_name
 
 
+def get_point_records(point):
+    """
+    Returns ordered dict of all plugin records of plugin point by id,
+    regardless of status, from plugin registry snapshot, or ``None``, when
+    registry cache is disabled.
+    """
+    if not registry.is_enabled():
+        return None
+    if not isinstance(point, six.string_types):
+        point = get_plugin_name(point)
+    return registry.get_snapshot().get_members(point)
+
+
+def get_record_model(record):
+    """
+    Returns ``Plugin`` instance with values of ``record``, without reading
+    it from database. ``point`` of the instance is not set.
+    """
+    plugin = Plugin(**dict((field, getattr(record, field))
+                           for field in PluginRecord.fields))
+    plugin._state.adding = False
+    plugin._state.db = router.db_for_read(Plugin)
+    return plugin
+
+
+def get_rel(field):
+    # Django < 1.9
+    return getattr(field, 'remote_field', None) or field.rel
+
+
 class PluginField(models.ForeignKey):
+    """
+    Foreign key to a plugin of ``point``. With plugin registry cache
+    enabled, plugin ids are validated and form choices are rendered from
+    registry snapshot, without querying plugin tables.
+    """
+
     def __init__(self, point=None, *args, **kwargs):
+        self.point = point
 
         # If not migrating, add a new fields.
         if point is not None:
@@ -19,9 +60,37 @@ class PluginField(models.ForeignKey):
         super(PluginField, self).__init__(
             to=kwargs.pop("to", Plugin), *args, **kwargs)
 
+    def validate(self, value, model_instance):
+        rel = get_rel(self)
+        records = None
+        if self.point is not None and \
+                rel.field_name == Plugin._meta.pk.name:
+            records = get_point_records(self.point)
+        if records is None:
+            return super(PluginField, self).validate(value, model_instance)
+        # Skip the database lookup of ForeignKey.validate().
+        super(models.ForeignKey, self).validate(value, model_instance)
+        if value is not None and value not in records:
+            raise ValidationError(
+                self.error_messages['invalid'], code='invalid',
+                params={'model': rel.model._meta.verbose_name, 'pk': value,
+                        'field': rel.field_name, 'value': value})
+
+    def formfield(self, **kwargs):
+        if self.point is not None and 'form_class' not in kwargs:
+            kwargs.update(form_class=PointPluginChoiceField, point=self.point)
+        return super(PluginField, self).formfield(**kwargs)
+
 
 class ManyPluginField(models.ManyToManyField):
+    """
+    Many to many relation to plugins of ``point``. With plugin registry
+    cache enabled, form choices are rendered and validated from registry
+    snapshot.
+    """
+
     def __init__(self, point=None, *args, **kwargs):
+        self.point = point
 
         # If not migrating, add a new fields.
         if point is not None:
@@ -32,6 +101,12 @@ class ManyPluginField(models.ManyToManyField):
         super(ManyPluginField, self).__init__(
             to=kwargs.pop("to", Plugin), *args, **kwargs)
 
+    def formfield(self, **kwargs):
+        if self.point is not None and 'form_class' not in kwargs:
+            kwargs.update(form_class=PointPluginMultipleChoiceField,
+                          point=self.point)
+        return super(ManyPluginField, self).formfield(**kwargs)
+
 
 def get_plugins_qs(point):
     return point.get_plugins_qs().exclude(name__isnull=True)
@@ -68,3 +143,78 @@ class PluginModelMultipleChoiceField(forms.ModelMultipleChoiceField):
     def __init__(self, point, *args, **kwargs):
         super(PluginModelMultipleChoiceField, self).\
             __init__(queryset=get_plugins_qs(point), **kwargs)
+
+
+class PointChoiceIterator(ModelChoiceIterator):
+    def __iter__(self):
+        records = self.field.get_records()
+        if records is None:
+            for choice in super(PointChoiceIterator, self).__iter__():
+                yield choice
+            return
+        if self.field.empty_label is not None:
+            yield ('', self.field.empty_label)
+        for record in six.itervalues(records):
+            yield (record.pk, self.field.label_from_instance(record))
+
+    def __len__(self):
+        records = self.field.get_records()
+        if records is None:
+            return super(PointChoiceIterator, self).__len__()
+        return len(records) + (1 if self.field.empty_label is not None else 0)
+
+
+class PointChoicesMixin(object):
+    """
+    Choices of all plugins of ``point`` regardless of status, cleaned to
+    ``Plugin`` instances. With plugin registry cache enabled, choices are
+    read from registry snapshot, otherwise from ``queryset``.
+    """
+
+    iterator = PointChoiceIterator
+
+    def __init__(self, point, *args, **kwargs):
+        self.point = point
+        super(PointChoicesMixin, self).__init__(*args, **kwargs)
+
+    def get_records(self):
+        if self.to_field_name not in (None, Plugin._meta.pk.name):
+            return None
+        return get_point_records(self.point)
+
+    def get_plugin_model(self, records, value):
+        try:
+            return get_record_model(records[Plugin._meta.pk.to_python(value)])
+        except (KeyError, ValidationError):
+            raise ValidationError(self.error_messages['invalid_choice'],
+                                  code='invalid_choice',
+                                  params={'value': value})
+
+
+class PointPluginChoiceField(PointChoicesMixin, forms.ModelChoiceField):
+    def to_python(self, value):
+        records = self.get_records()
+        if records is None:
+            return super(PointPluginChoiceField, self).to_python(value)
+        if value in self.empty_values:
+            return None
+        return self.get_plugin_model(records, value)
+
+
+class PointPluginMultipleChoiceField(PointChoicesMixin,
+                                     forms.ModelMultipleChoiceField):
+    def clean(self, value):
+        records = self.get_records()
+        if records is None:
+            return super(PointPluginMultipleChoiceField, self).clean(value)
+        value = self.prepare_value(value)
+        if not value:
+            if self.required:
+                raise ValidationError(self.error_messages['required'],
+                                      code='required')
+            return []
+        if not isinstance(value, (list, tuple)):
+            raise ValidationError(self.error_messages['list'], code='list')
+        plugins = [self.get_plugin_model(records, pk) for pk in value]
+        self.run_validators(value)
+        return plugins
@@ -11,14 +11,17 @@ except ImportError:
 
 
 from djangoplugins import models as plugins_app
-from .commands.syncplugins import SyncPlugins
+from djangoplugins.backends import get_backend
+from djangoplugins.utils import get_setting
 
 
 def sync_plugins(sender, verbosity, **kwargs):
     # Different django version have different senders.
     if (hasattr(sender, "name") and sender.name == "djangoplugins") or \
             (sender == plugins_app):
-        SyncPlugins(False, verbosity).all()
+        get_backend().sync(
+            verbosity,
+            changed_only=get_setting('SYNC_CHANGED_ONLY', False))
 
 
 # Plugins must be synced to the database.
@@ -0,0 +1,32 @@
+from __future__ import absolute_import
+
+import json
+from optparse import make_option
+
+from django import VERSION as django_version
+from django.core.management.base import BaseCommand
+
+from djangoplugins.state import dump_state
+
+
+class Command(BaseCommand):
+    help = ("Output state of all plugin points and plugins as JSON, keyed "
+            "by pythonpath.")
+    if django_version <= (1, 8):
+        option_list = BaseCommand.option_list + (
+            make_option('--indent',
+                        type='int',
+                        dest='indent',
+                        default=None,
+                        help='indent JSON output by this number of '
+                        'spaces.'),
+        )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--indent', type=int, dest='indent',
+            help='indent JSON output by this number of spaces.')
+
+    def handle(self, *args, **options):
+        self.stdout.write(json.dumps(dump_state(), sort_keys=True,
+                                     indent=options.get('indent')))
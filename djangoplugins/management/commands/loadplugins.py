@@ -0,0 +1,33 @@
+from __future__ import absolute_import
+
+import json
+import sys
+
+from django import VERSION as django_version
+from django.core.management.base import BaseCommand
+
+from djangoplugins.state import load_state
+
+
+class Command(BaseCommand):
+    help = ("Load state of plugin points and plugins from JSON file, "
+            "created by dumpplugins command, or from standard input.")
+    if django_version <= (1, 8):
+        args = '[file]'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'file', nargs='?', default='-',
+            help='JSON file, created by dumpplugins command.')
+
+    def handle(self, *args, **options):
+        path = options.get('file') or (args[0] if args else '-')
+        if path == '-':
+            data = json.load(sys.stdin)
+        else:
+            with open(path) as f:
+                data = json.load(f)
+        count = load_state(data)
+        if int(options.get('verbosity', 1)) >= 1:
+            self.stdout.write('Loaded %d changed plugin points and plugins.'
+                              % count)
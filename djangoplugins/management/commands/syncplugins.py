@@ -5,11 +5,18 @@ from optparse import make_option
 from django import VERSION as django_version
 
 from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Q
 from django.utils import six
 
+from djangoplugins.backends import get_backend
+from djangoplugins.checks import get_point_fingerprint, check_registry
 from djangoplugins.point import PluginMount
-from djangoplugins.utils import get_plugin_name, load_plugins, db_table_exists
-from djangoplugins.models import Plugin, PluginPoint, REMOVED, ENABLED
+from djangoplugins.utils import get_plugin_name, get_setting, load_plugins, \
+    db_table_exists
+from djangoplugins.models import Plugin, PluginPoint, PluginLock, \
+    PluginChange, REMOVED, ENABLED
+from djangoplugins.signals import django_plugins_synced
 
 
 class Command(BaseCommand):
@@ -23,6 +30,30 @@ class Command(BaseCommand):
                         default=False,
                         help='delete the REMOVED Plugin and PluginPoint '
                         'instances.'),
+            make_option('--chunk-size',
+                        type='int',
+                        dest='chunk_size',
+                        default=None,
+                        help='walk database in chunks of this size, '
+                        'keeping memory usage bounded.'),
+            make_option('--app',
+                        action='append',
+                        dest='apps',
+                        default=None,
+                        help='sync only plugin points of this application '
+                        '(label or module), may be repeated.'),
+            make_option('--point',
+                        action='append',
+                        dest='points',
+                        default=None,
+                        help='sync only plugin point with this pythonpath, '
+                        'may be repeated.'),
+            make_option('--changed',
+                        action='store_true',
+                        dest='changed_only',
+                        default=False,
+                        help='skip plugin points, whose stored fingerprint '
+                        'matches registered plugins.'),
         )
 
     requires_model_validation = True
@@ -33,10 +64,32 @@ class Command(BaseCommand):
             dest='delete',
             help='delete the REMOVED Plugin and PluginPoint '
             'instances. ')
+        parser.add_argument('--chunk-size',
+            type=int,
+            dest='chunk_size',
+            help='walk database in chunks of this size, keeping memory '
+            'usage bounded.')
+        parser.add_argument('--app',
+            action='append',
+            dest='apps',
+            help='sync only plugin points of this application (label or '
+            'module), may be repeated.')
+        parser.add_argument('--point',
+            action='append',
+            dest='points',
+            help='sync only plugin point with this pythonpath, may be '
+            'repeated.')
+        parser.add_argument('--changed',
+            action='store_true',
+            dest='changed_only',
+            help='skip plugin points, whose stored fingerprint matches '
+            'registered plugins.')
 
     def handle(self, *args, **options):
-        sync = SyncPlugins(options.get('delete'), options.get('verbosity'))
-        sync.all()
+        get_backend().sync(options.get('verbosity'), options.get('delete'),
+                           options.get('chunk_size'), apps=options.get('apps'),
+                           points=options.get('points'),
+                           changed_only=options.get('changed_only'))
 
 
 class SyncPlugins():
@@ -48,12 +101,65 @@ class SyncPlugins():
 
     ``dst``
         destination, database
+
+    If ``chunk_size`` is given (defaults to ``DJANGOPLUGINS_SYNC_CHUNK_SIZE``
+    setting), database is walked in chunks of at most ``chunk_size``
+    instances, instead of loading all of them at once.
+
+    Synchronization runs in a transaction, holding ``PluginLock`` row
+    ``lock_name``. Nodes, which had to wait for the lock, skip
+    synchronization, if another node already brought database in sync.
+
+    ``apps`` (labels or module names) and ``points`` (pythonpaths) limit
+    synchronization to those plugin points, other points are left untouched.
+    With ``changed_only``, plugins of points, whose stored fingerprint
+    matches registered plugins, are not read from database.
     """
 
-    def __init__(self, delete_removed=False, verbosity=1):
+    lock_name = 'syncplugins'
+
+    def __init__(self, delete_removed=False, verbosity=1, chunk_size=None,
+                 apps=None, points=None, changed_only=False):
         load_plugins()
         self.delete_removed = delete_removed
         self.verbosity = int(verbosity)
+        if chunk_size is None:
+            chunk_size = get_setting('SYNC_CHUNK_SIZE')
+        self.chunk_size = chunk_size
+        self.modules = [self.get_app_module(i) for i in apps or ()]
+        self.point_names = set(points or ())
+        self.changed_only = changed_only
+        self.reenabled = set()
+
+    def get_app_module(self, app):
+        try:
+            from django.apps import apps as app_registry
+        except ImportError:
+            # Django < 1.7
+            return app
+        try:
+            return app_registry.get_app_config(app).name
+        except LookupError:
+            return app
+
+    def is_selected(self, pythonpath):
+        if self.point_names and pythonpath not in self.point_names:
+            return False
+        if self.modules:
+            return any(pythonpath.startswith(module + '.')
+                       for module in self.modules)
+        return True
+
+    def get_points_qs(self):
+        qs = PluginPoint.objects.all()
+        if self.point_names:
+            qs = qs.filter(pythonpath__in=self.point_names)
+        if self.modules:
+            query = Q()
+            for module in self.modules:
+                query |= Q(pythonpath__startswith=module + '.')
+            qs = qs.filter(query)
+        return qs
 
     def print_(self, verbosity, message):
         if self.verbosity >= verbosity:
@@ -65,6 +171,50 @@ class SyncPlugins():
     def get_instances_dict(self, qs):
         return dict((i.pythonpath, i) for i in qs)
 
+    def iter_instances(self, qs):
+        """
+        Iterate over ``qs`` in primary key order, loading at most
+        ``chunk_size`` instances at once.
+        """
+        last_pk = None
+        while True:
+            chunk_qs = qs.order_by('pk')
+            if last_pk is not None:
+                chunk_qs = chunk_qs.filter(pk__gt=last_pk)
+            chunk = list(chunk_qs[:self.chunk_size])
+            for inst in chunk:
+                yield inst
+            if len(chunk) < self.chunk_size:
+                break
+            last_pk = chunk[-1].pk
+
+    def stream(self, src, qs, model):
+        """
+        Same as ``available`` followed by ``missing``, but walks database
+        instances in chunks and matches them against registered classes.
+        """
+        src = dict(src)
+        for inst in self.iter_instances(qs):
+            cls = src.pop(inst.pythonpath, None)
+            if cls is None:
+                self.missing({inst.pythonpath: inst})
+            else:
+                for item in self.available({inst.pythonpath: cls},
+                                           {inst.pythonpath: inst}, model):
+                    yield item
+        for item in self.available(src, {}, model):
+            yield item
+
+    def sync_items(self, src, qs, model):
+        """
+        Returns pairs of registered classes and prepared instances, and
+        instances, which still have to be passed to ``missing``.
+        """
+        if self.chunk_size:
+            return self.stream(src, qs, model), {}
+        dst = self.get_instances_dict(qs)
+        return self.available(src, dst, model), dst
+
     def available(self, src, dst, model):
         """
         Iterate over all registered plugins or plugin points and prepare to add
@@ -80,8 +230,15 @@ class SyncPlugins():
                 self.print_(1, "Updating %s for %s" % (model.__name__, name))
                 # re-enable a previously removed plugin point and its plugins
                 inst.status = ENABLED
+                self.reenabled.add(name)
             yield point, inst
 
+    def save(self, inst):
+        # Unchanged instances are not saved, so that a sync of unchanged
+        # plugins neither logs changes nor invalidates plugin registry.
+        if inst.pk is None or inst.is_dirty(check_relationship=True):
+            inst.save()
+
     def missing(self, dst):
         """
         Mark all missing plugins, that exists in database, but are not
@@ -92,42 +249,88 @@ class SyncPlugins():
                 inst.status = REMOVED
                 inst.save()
 
-    def delete(self, dst):
-        count = dst.objects.filter(status=REMOVED).count()
+    def delete(self, dst, qs=None):
+        if qs is None:
+            qs = dst.objects.all()
+        qs = qs.filter(status=REMOVED)
+        count = qs.count()
         if count:
             self.print_(1, "Deleting %d Removed %ss" % (count, dst.__name__))
-            dst.objects.filter(status=REMOVED).delete()
+            if not self.chunk_size:
+                qs.delete()
+                return
+            for pks in self.chunks(qs):
+                if dst is PluginPoint:
+                    # Delete plugins first, so that the cascade does not
+                    # load all plugins of the points at once.
+                    for plugin_pks in self.chunks(
+                            Plugin.objects.filter(point__in=pks)):
+                        Plugin.objects.filter(pk__in=plugin_pks).delete()
+                dst.objects.filter(pk__in=pks).delete()
+
+    def chunks(self, qs):
+        """
+        Yields lists of ``chunk_size`` primary keys of ``qs``, each of which
+        has to be deleted before the next one is read.
+        """
+        qs = qs.order_by('pk')
+        while True:
+            pks = list(qs.values_list('pk', flat=True)[:self.chunk_size])
+            if not pks:
+                return
+            yield pks
+
+    def is_unchanged(self, point, inst):
+        return inst.pk is not None and inst.pythonpath not in self.reenabled \
+            and inst.fingerprint == get_point_fingerprint(point)
 
     def points(self):
-        src = self.get_classes_dict(PluginMount.points)
-        dst = self.get_instances_dict(PluginPoint.objects.all())
+        src = self.get_classes_dict(
+            point for point in PluginMount.points
+            if self.is_selected(get_plugin_name(point)))
+        items, dst = self.sync_items(src, self.get_points_qs(), PluginPoint)
 
-        for point, inst in self.available(src, dst, PluginPoint):
+        for point, inst in items:
+            if self.changed_only and self.is_unchanged(point, inst):
+                self.print_(2, "Skipping unchanged %s" % inst.pythonpath)
+                continue
             if hasattr(point, '_title'):
                 inst.title = point._title
             else:
                 inst.title = inst.pythonpath.split('.')[-1]
-            inst.save()
+            self.save(inst)
             self.plugins(point, inst)
+            self.fingerprint(point, inst)
 
         self.missing(dst)
 
         if self.delete_removed:
-            self.delete(PluginPoint)
+            self.delete(PluginPoint, self.get_points_qs())
 
     def plugins(self, point, point_inst):
         src = self.get_classes_dict(point.plugins)
-        dst = self.get_instances_dict(point_inst.plugin_set.all())
+        items, dst = self.sync_items(src, point_inst.plugin_set.all(), Plugin)
 
-        for plugin, inst in self.available(src, dst, Plugin):
+        for plugin, inst in items:
             inst.point = point_inst
             inst.name = getattr(plugin, 'name', None)
             if hasattr(plugin, 'title'):
                 inst.title = six.text_type(getattr(plugin, 'title'))
-            inst.save()
+            self.save(inst)
 
         self.missing(dst)
 
+    def fingerprint(self, point, point_inst):
+        """
+        Stores fingerprint of synchronized plugin point, used to check if
+        database is in sync without reading all plugins.
+        """
+        fingerprint = get_point_fingerprint(point)
+        if point_inst.fingerprint != fingerprint:
+            PluginPoint.objects.filter(pk=point_inst.pk).\
+                update(fingerprint=fingerprint)
+            point_inst.fingerprint = fingerprint
+
     def all(self):
         """
         Synchronize all registered plugins and plugin points to database.
@@ -142,4 +345,26 @@ class SyncPlugins():
                 not db_table_exists(Plugin._meta.db_table) or
                 not db_table_exists(PluginPoint._meta.db_table)):
             return
-        self.points()
+        if not db_table_exists(PluginLock._meta.db_table):
+            self.points()
+        else:
+            with transaction.atomic():
+                if not self.lock():
+                    return
+                self.points()
+                if PluginChange.objects.is_enabled():
+                    PluginChange.objects.prune()
+        django_plugins_synced.send(sender=self.__class__)
+
+    def lock(self):
+        """
+        Takes database lock, so that only one node of a cluster synchronizes
+        plugins at a time. Returns ``False``, if another node synchronized
+        plugins, while this one was waiting for the lock, and database is
+        now in sync.
+        """
+        if PluginLock.objects.acquire(self.lock_name) or \
+                self.delete_removed or check_registry():
+            return True
+        self.print_(1, "Plugins were synced by another process")
+        return False
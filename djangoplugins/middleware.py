@@ -0,0 +1,51 @@
+from __future__ import absolute_import
+
+from django.utils import six
+
+try:
+    from django.utils.deprecation import MiddlewareMixin
+except ImportError:  # Django < 1.10
+    MiddlewareMixin = object
+
+from .registry import RequestPlugins, activate, deactivate
+from .utils import get_setting, get_plugin_from_string
+
+
+class PluginsMiddleware(MiddlewareMixin):
+    """
+    Attaches lazy ``request.plugins`` accessor to each request.
+
+    While request is processed, ``PluginPoint.get_plugins()``,
+    ``PluginPoint.get_plugin(name)`` and ``Plugin.get_plugin()`` read plugins
+    from it, so each plugin point is resolved at most once per request.
+
+    If ``DJANGOPLUGINS_REQUEST_SCOPE`` setting is set, plugins are resolved
+    within the scope, returned by that function for the request.
+
+    Plugin points (classes or pythonpaths), listed in
+    ``DJANGOPLUGINS_PREFETCH_POINTS`` setting, are resolved together, with a
+    single query, when request starts.
+    """
+
+    def get_scope(self, request):
+        """
+        Returns plugin scope of request, using function, given by dotted
+        path in ``DJANGOPLUGINS_REQUEST_SCOPE`` setting.
+        """
+        scope_function = get_setting('REQUEST_SCOPE')
+        if scope_function is None:
+            return None
+        if isinstance(scope_function, six.string_types):
+            scope_function = get_plugin_from_string(scope_function)
+        return scope_function(request)
+
+    def process_request(self, request):
+        request.plugins = RequestPlugins(self.get_scope(request))
+        points = get_setting('PREFETCH_POINTS')
+        if points:
+            request.plugins.prefetch(points)
+        activate(request.plugins)
+
+    def process_response(self, request, response):
+        deactivate()
+        return response
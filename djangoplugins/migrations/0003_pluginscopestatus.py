@@ -0,0 +1,28 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djangoplugins', '0002_pluginpoint_fingerprint'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PluginScopeStatus',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(db_index=True, max_length=255)),
+                ('status', models.SmallIntegerField(choices=[(0, 'Enabled'), (1, 'Disabled')], default=0)),
+                ('plugin', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='scope_statuses', to='djangoplugins.Plugin')),
+            ],
+        ),
+        migrations.AlterUniqueTogether(
+            name='pluginscopestatus',
+            unique_together=set([('plugin', 'scope')]),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djangoplugins', '0003_pluginscopestatus'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PluginChange',
+            fields=[
+                ('seq', models.AutoField(primary_key=True, serialize=False)),
+                ('pythonpath', models.CharField(max_length=255)),
+                ('action', models.SmallIntegerField(choices=[(0, 'Changed'), (1, 'Deleted'), (2, 'Reset')], default=0)),
+                ('status', models.SmallIntegerField(choices=[(0, 'Enabled'), (1, 'Disabled'), (2, 'Removed')], null=True)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'ordering': ('seq',),
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djangoplugins', '0004_pluginchange'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PluginLock',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100, unique=True)),
+                ('locked', models.DateTimeField(null=True)),
+            ],
+        ),
+    ]
@@ -0,0 +1,19 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('djangoplugins', '0005_pluginlock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='plugin',
+            name='config',
+            field=models.TextField(blank=True, default=''),
+        ),
+    ]
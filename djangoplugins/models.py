@@ -1,11 +1,21 @@
 from __future__ import absolute_import
 
+import json
+
 from dirtyfields import DirtyFieldsMixin
-from django.db import models
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.db import connections, models, transaction, DatabaseError
+from django.db.models.signals import pre_save, post_save, post_delete
+try:
+    from django.db.models import Case, When, Value
+except ImportError:  # Django < 1.8
+    Case = When = Value = None
+from django.utils import six, timezone
 from django.utils.translation import ugettext_lazy as _
 from django.utils.encoding import python_2_unicode_compatible
-from djangoplugins.signals import django_plugin_enabled, django_plugin_disabled
-from .utils import get_plugin_name, get_plugin_from_string
+from djangoplugins.signals import send_plugin_status
+from .utils import get_plugin_name, get_plugin_from_string, get_setting, \
+    db_column_exists
 
 ENABLED = 0
 DISABLED = 1
@@ -20,6 +30,20 @@ STATUS_CHOICES = (
 STATUS_CHOICES_ENABLED = (ENABLED,)
 STATUS_CHOICES_DISABLED = (DISABLED, REMOVED,)
 
+CHANGED = 0
+DELETED = 1
+RESET = 2
+
+ACTION_CHOICES = (
+    (CHANGED, _('Changed')),
+    (DELETED, _('Deleted')),
+    (RESET,   _('Reset')),
+)
+
+# Plugins renumbered by one query of PluginManager.reorder(), keeping query
+# parameters under SQLite limit of 999.
+REORDER_BATCH = 300
+
 
 class PluginPointManager(models.Manager):
     def get_point(self, point):
@@ -27,10 +51,12 @@ class PluginPointManager(models.Manager):
 
 
 @python_2_unicode_compatible
-class PluginPoint(models.Model):
+class PluginPoint(DirtyFieldsMixin, models.Model):
     pythonpath = models.CharField(max_length=255)
     title = models.CharField(max_length=255)
     status = models.SmallIntegerField(choices=STATUS_CHOICES, default=ENABLED)
+    fingerprint = models.CharField(max_length=40, default='', blank=True,
+                                   editable=False)
 
     objects = PluginPointManager()
 
@@ -38,6 +64,141 @@ class PluginPoint(models.Model):
         return self.title
 
 
+def get_plugin_instance(pythonpath):
+    """
+    Returns plugin instance for ``pythonpath``, shared within current request
+    if possible.
+    """
+    from .registry import registry, get_request_plugins
+
+    request_plugins = get_request_plugins()
+    if request_plugins is not None:
+        plugin = request_plugins.get_instance(pythonpath)
+        if plugin is not None:
+            return plugin
+    return registry.create(pythonpath)
+
+
+@python_2_unicode_compatible
+class PluginRecord(object):
+    """
+    Read-only representation of a plugin, used instead of ``Plugin`` model
+    instances on hot read paths. Provides the same attributes as ``Plugin``,
+    except ``point``.
+    """
+    fields = ('id', 'pythonpath', 'name', 'title', 'index', 'status',
+              'config')
+    __slots__ = fields + ('parsed_config',)
+
+    def __init__(self, id, pythonpath, name, title, index, status,
+                 config=''):
+        self.id = id
+        self.pythonpath = pythonpath
+        self.name = name
+        self.title = title
+        self.index = index
+        self.status = status
+        self.config = config
+        self.parsed_config = None
+
+    @property
+    def pk(self):
+        return self.id
+
+    def __str__(self):
+        return self.title or self.name or self.pythonpath
+
+    def __repr__(self):
+        return '<PluginRecord: %s>' % self.pythonpath
+
+    def is_active(self):
+        return self.status == ENABLED
+
+    def get_plugin(self):
+        return get_plugin_instance(self.pythonpath)
+
+    def get_config(self):
+        """
+        Returns parsed plugin config, parsing it only once.
+        """
+        if self.parsed_config is None:
+            self.parsed_config = parse_config(self.config)
+        return self.parsed_config
+
+
+def get_record_fields():
+    """
+    Returns ``PluginRecord.fields`` to select from ``Plugin`` table, without
+    ``config`` until its column is migrated. Plugin lookups run on URLconf
+    import, which happens in system checks before ``migrate``.
+    """
+    if db_column_exists(Plugin._meta.db_table, 'config'):
+        return PluginRecord.fields
+    return PluginRecord.fields[:-1]
+
+
+def parse_config(config):
+    """
+    Returns plugin config, stored as JSON text, as dict.
+    """
+    if not config:
+        return {}
+    return json.loads(config)
+
+
+def validate_config(pythonpath, config):
+    """
+    Validates parsed ``config`` against ``config_schema`` attribute of
+    plugin class, if it has one, using ``jsonschema`` package. Raises
+    ``ValidationError``.
+    """
+    schema = getattr(get_plugin_from_string(pythonpath), 'config_schema',
+                     None)
+    if schema is None:
+        return
+    try:
+        import jsonschema
+    except ImportError:
+        raise ImproperlyConfigured('jsonschema package is required to '
+                                   'validate plugin config.')
+    try:
+        jsonschema.validate(config, schema)
+    except jsonschema.ValidationError as e:
+        raise ValidationError(e.message)
+
+
+class ScopeStatus(object):
+    """
+    Compact set of plugin status overrides of one scope.
+
+    ``positions`` maps plugin ids to bit positions, overrides are stored as
+    two bitsets of enabled and disabled plugins.
+    """
+    __slots__ = ('positions', 'enabled', 'disabled')
+
+    def __init__(self, positions, rows):
+        self.positions = positions
+        self.enabled = self.disabled = 0
+        for plugin_id, status in rows:
+            if plugin_id not in positions:
+                continue
+            bit = 1 << positions[plugin_id]
+            if status in STATUS_CHOICES_ENABLED:
+                self.enabled |= bit
+            else:
+                self.disabled |= bit
+
+    def is_enabled(self, plugin):
+        if plugin.status == REMOVED:
+            return False
+        bit = 1 << self.positions[plugin.id]
+        if self.enabled & bit:
+            return True
+        if self.disabled & bit:
+            return False
+        return plugin.status == ENABLED
+
+
 class PluginManager(models.Manager):
     def get_plugin(self, plugin):
         return self.get(pythonpath=get_plugin_name(plugin))
@@ -46,9 +207,116 @@ class PluginManager(models.Manager):
         return self.filter(point__pythonpath=get_plugin_name(point),
                            status=ENABLED)
 
+    def get_records_of(self, point, scope=None):
+        """
+        Returns ordered list of ``PluginRecord`` of enabled plugins of
+        ``point`` class or pythonpath, without building model instances.
+
+        If ``scope`` is given, plugin status overrides of this scope are
+        applied.
+        """
+        if not isinstance(point, six.string_types):
+            point = get_plugin_name(point)
+        return self.get_records_for([point], scope)[point]
+
+    def get_records_for(self, points, scope=None):
+        """
+        Same as ``get_records_of``, but for several plugin point pythonpaths
+        at once, using a single query (two with ``scope``). Returns dict of
+        record lists by point pythonpath.
+        """
+        if scope is None:
+            qs = self.filter(point__pythonpath__in=points, status=ENABLED)
+        else:
+            qs = self.filter(point__pythonpath__in=points).\
+                exclude(status=REMOVED)
+        qs = qs.order_by('index', 'id').\
+            values_list('point__pythonpath', *get_record_fields())
+        rows = [(row[0], PluginRecord(*row[1:])) for row in qs]
+        if scope is not None:
+            positions = dict((record.id, i)
+                             for i, (point, record) in enumerate(rows))
+            scope_rows = PluginScopeStatus.objects.\
+                filter(scope=scope, plugin__point__pythonpath__in=points).\
+                values_list('plugin_id', 'status')
+            scope_status = ScopeStatus(positions, scope_rows)
+            rows = [(point, record) for point, record in rows
+                    if scope_status.is_enabled(record)]
+        records = dict((point, []) for point in points)
+        for point, record in rows:
+            records[point].append(record)
+        return records
+
     def get_by_natural_key(self, name):
         return self.get(pythonpath=name)
 
+    def set_status(self, qs, status):
+        """
+        Changes status of all plugins in ``qs`` using a single update query,
+        instead of saving each plugin. ``django_plugin_enabled`` or
+        ``django_plugin_disabled`` signal is sent for each plugin, whose
+        status was changed. Plugins marked ``REMOVED`` by ``syncplugins``
+        are left alone. Returns number of changed plugins.
+        """
+        from .registry import bump_version_on_commit
+
+        qs = qs.exclude(status=REMOVED)
+        with transaction.atomic(using=self.db):
+            changed = list(qs.exclude(status=status).
+                           values_list('pythonpath', flat=True))
+            if not changed:
+                return 0
+            qs.exclude(status=status).update(status=status)
+            PluginChange.objects.log(changed, status=status)
+            bump_version_on_commit(self.db)
+
+        for pythonpath in changed:
+            try:
+                plugin = get_plugin_from_string(pythonpath)()
+            except (ImportError, AttributeError):
+                # Plugin was removed from code.
+                continue
+            send_plugin_status(self.model, plugin,
+                               status in STATUS_CHOICES_ENABLED, self.db)
+        return len(changed)
+
+    def reorder(self, qs, step=10):
+        """
+        Renumbers ``index`` of plugins in ``qs`` within each plugin point,
+        keeping their current order. Only plugins, whose index changes, are
+        updated, ``REORDER_BATCH`` of them in one query. Returns number of
+        changed plugins.
+        """
+        from .registry import bump_version_on_commit
+
+        with transaction.atomic(using=self.db):
+            rows = qs.order_by('point', 'index', 'id').\
+                values_list('pk', 'point', 'pythonpath', 'index')
+            index, last_point, changed = 0, None, []
+            for pk, point, pythonpath, old_index in rows:
+                index = index + step if point == last_point else step
+                last_point = point
+                if index != old_index:
+                    changed.append((pk, pythonpath, index))
+            if not changed:
+                return 0
+            for i in range(0, len(changed), REORDER_BATCH):
+                self.set_indexes(changed[i:i + REORDER_BATCH])
+            PluginChange.objects.log([pythonpath
+                                      for pk, pythonpath, index in changed])
+            bump_version_on_commit(self.db)
+        return len(changed)
+
+    def set_indexes(self, items):
+        if Case is None:
+            for pk, pythonpath, index in items:
+                self.filter(pk=pk).update(index=index)
+            return
+        self.filter(pk__in=[pk for pk, pythonpath, index in items]).update(
+            index=Case(*[When(pk=pk, then=Value(index))
+                         for pk, pythonpath, index in items],
+                       output_field=models.IntegerField()))
+
 
 @python_2_unicode_compatible
 class Plugin(DirtyFieldsMixin, models.Model):
@@ -74,6 +342,10 @@ class Plugin(DirtyFieldsMixin, models.Model):
 
     status
         Plugin status.
+
+    config
+        Plugin configuration as JSON object, validated against
+        ``config_schema`` of plugin class, if defined.
     """
     point = models.ForeignKey(PluginPoint)
     pythonpath = models.CharField(max_length=255, unique=True)
@@ -81,6 +353,7 @@ class Plugin(DirtyFieldsMixin, models.Model):
     title = models.CharField(max_length=255, default='', blank=True)
     index = models.IntegerField(default=0)
     status = models.SmallIntegerField(choices=STATUS_CHOICES, default=ENABLED)
+    config = models.TextField(default='', blank=True)
 
     objects = PluginManager()
 
@@ -102,16 +375,250 @@ class Plugin(DirtyFieldsMixin, models.Model):
         return self.status == ENABLED
 
     def get_plugin(self):
-        plugin_class = get_plugin_from_string(self.pythonpath)
-        return plugin_class()
+        return get_plugin_instance(self.pythonpath)
+
+    def get_config(self):
+        return parse_config(self.config)
+
+    def set_config(self, config):
+        """
+        Validates and saves plugin config.
+        """
+        validate_config(self.pythonpath, config)
+        self.config = json.dumps(config, sort_keys=True)
+        self.save()
+
+    def clean(self):
+        try:
+            config = self.get_config()
+        except ValueError:
+            raise ValidationError({'config': _('Enter valid JSON.')})
+        if not isinstance(config, dict):
+            raise ValidationError({'config': _('Enter a JSON object.')})
+        try:
+            validate_config(self.pythonpath, config)
+        except ValidationError as e:
+            raise ValidationError({'config': e.messages})
 
     def save(self, *args, **kwargs):
-        if "status" in self.get_dirty_fields().keys() and self.pk:
-            if self.status in STATUS_CHOICES_ENABLED:
-                django_plugin_enabled.send(sender=self.__class__,
-                                           plugin=self.get_plugin())
-            else:
-                django_plugin_disabled.send(sender=self.__class__,
-                                            plugin=self.get_plugin())
+        status_changed = self.pk and "status" in self.get_dirty_fields()
+        super(Plugin, self).save(*args, **kwargs)
+        if status_changed:
+            send_plugin_status(self.__class__, self.get_plugin(),
+                               self.status in STATUS_CHOICES_ENABLED,
+                               kwargs.get('using'))
+
+
+@python_2_unicode_compatible
+class PluginScopeStatus(models.Model):
+    """
+    Status of a plugin, overridden within one scope.
+
+    scope
+        Any string, identifying a site, tenant or similar, for example
+        ``'site:1'``.
+
+    status
+        Plugin status within this scope.
+    """
+    plugin = models.ForeignKey(Plugin, related_name='scope_statuses')
+    scope = models.CharField(max_length=255, db_index=True)
+    status = models.SmallIntegerField(choices=STATUS_CHOICES[:2],
+                                      default=ENABLED)
+
+    class Meta:
+        unique_together = (("plugin", "scope"),)
+
+    def __str__(self):
+        return '%s: %s' % (self.scope, self.plugin)
+
+
+def get_site_scope(site):
+    """
+    Returns scope of ``django.contrib.sites`` site or site id.
+    """
+    return 'site:%s' % getattr(site, 'pk', site)
+
+
+class PluginChangeManager(models.Manager):
+    def is_enabled(self):
+        return get_setting('CHANGE_LOG', True)
+
+    def log(self, pythonpaths, action=CHANGED, status=None):
+        """
+        Appends a change for each plugin pythonpath, using a single query.
+        """
+        if self.is_enabled():
+            self.bulk_create([
+                self.model(pythonpath=pythonpath, action=action,
+                           status=status)
+                for pythonpath in pythonpaths
+            ])
+
+    def since(self, seq):
+        """
+        Returns changes with sequence number greater than ``seq``, ordered
+        by sequence number.
+        """
+        return self.filter(seq__gt=seq or 0).order_by('seq')
+
+    def last_seq(self):
+        """
+        Returns sequence number of the last change or 0.
+        """
+        return self.aggregate(seq=models.Max('seq'))['seq'] or 0
+
+    def prune(self, seq=None):
+        """
+        Deletes changes with sequence number less than or equal to ``seq``,
+        by default all but the last ``DJANGOPLUGINS_CHANGE_LOG_LIMIT``, which
+        are needed for incremental refresh. Logs ``RESET``, if anything was
+        deleted, so that state loaded before the deleted changes is fully
+        reloaded. Returns number of deleted changes.
+        """
+        if seq is None:
+            seq = self.last_seq() - get_setting('CHANGE_LOG_LIMIT', 1000)
+        qs = self.filter(seq__lte=seq)
+        count = qs.count()
+        if count:
+            qs.delete()
+            self.log([''], RESET)
+        return count
+
+
+@python_2_unicode_compatible
+class PluginChange(models.Model):
+    """
+    Append-only log of plugin changes, used for incremental refresh of
+    plugin state. Logging can be disabled with ``DJANGOPLUGINS_CHANGE_LOG``
+    setting.
+
+    Sequence numbers are assigned on insert, so a change of a transaction,
+    which commits later than a concurrent one, may get a lower number.
+    Consumers, that need to see every change, should also reload all state
+    from time to time.
+
+    seq
+        Monotonic sequence number of the change.
+
+    pythonpath
+        Python path of changed plugin or plugin point.
+
+    action
+        ``CHANGED`` or ``DELETED`` for a plugin, ``RESET``, when anything
+        else changed and all plugin state must be reloaded.
+
+    status
+        New plugin status, if known.
+    """
+    seq = models.AutoField(primary_key=True)
+    pythonpath = models.CharField(max_length=255)
+    action = models.SmallIntegerField(choices=ACTION_CHOICES, default=CHANGED)
+    status = models.SmallIntegerField(choices=STATUS_CHOICES, null=True)
+    created = models.DateTimeField(auto_now_add=True)
+
+    objects = PluginChangeManager()
+
+    class Meta:
+        ordering = ('seq',)
+
+    def __str__(self):
+        return '%d: %s' % (self.seq, self.pythonpath)
+
+
+class PluginLockManager(models.Manager):
+    def acquire(self, name):
+        """
+        Locks row ``name`` until the end of current transaction, creating
+        it if needed. Returns ``False``, if the lock was held by another
+        transaction and had to be waited for, otherwise ``True``.
+
+        On databases without ``SELECT ... FOR UPDATE`` (SQLite), the row is
+        updated instead, which takes database write lock.
+        """
+        self.get_or_create(name=name)
+        qs = self.filter(name=name)
+        acquired = True
+        features = connections[self.db].features
+        if features.has_select_for_update:
+            if features.has_select_for_update_nowait:
+                try:
+                    with transaction.atomic(using=self.db):
+                        list(qs.select_for_update(nowait=True))
+                except DatabaseError:
+                    acquired = False
+            if not acquired or not features.has_select_for_update_nowait:
+                list(qs.select_for_update())
+        qs.update(locked=timezone.now())
+        return acquired
+
+
+@python_2_unicode_compatible
+class PluginLock(models.Model):
+    """
+    Named database lock row, used to run ``syncplugins`` on one node of a
+    cluster at a time.
+
+    name
+        Lock name.
+
+    locked
+        When the lock was last acquired.
+    """
+    name = models.CharField(max_length=100, unique=True)
+    locked = models.DateTimeField(null=True)
+
+    objects = PluginLockManager()
+
+    def __str__(self):
+        return self.name
+
+
+def remember_changed(sender, instance, **kwargs):
+    # Dirty state is reset by DirtyFieldsMixin after save, so it is checked
+    # before, for post_save receivers.
+    instance._plugin_changed = instance._state.adding or \
+        instance.is_dirty(check_relationship=True)
+
+
+def is_changed(instance):
+    """
+    Returns if saved ``Plugin`` or ``PluginPoint`` was created or changed.
+    """
+    return getattr(instance, '_plugin_changed', True)
+
+
+def log_plugin_saved(sender, instance, **kwargs):
+    if is_changed(instance):
+        PluginChange.objects.log([instance.pythonpath],
+                                 status=instance.status)
+
+
+def log_plugin_deleted(sender, instance, **kwargs):
+    PluginChange.objects.log([instance.pythonpath], DELETED)
+
+
+def log_reset(sender, instance, **kwargs):
+    PluginChange.objects.log([getattr(instance, 'pythonpath', '')], RESET)
+
+
+def log_reset_saved(sender, instance, **kwargs):
+    if is_changed(instance):
+        log_reset(sender, instance)
+
 
-        return super(Plugin, self).save(*args, **kwargs)
+for model in (Plugin, PluginPoint):
+    pre_save.connect(remember_changed, sender=model,
+                     dispatch_uid='djangoplugins.changes.%s.pre_save' %
+                     model.__name__)
+post_save.connect(log_plugin_saved, sender=Plugin,
+                  dispatch_uid='djangoplugins.changes.plugin.save')
+post_delete.connect(log_plugin_deleted, sender=Plugin,
+                    dispatch_uid='djangoplugins.changes.plugin.delete')
+for model in (PluginPoint, PluginScopeStatus):
+    post_save.connect(log_reset_saved, sender=model,
+                      dispatch_uid='djangoplugins.changes.%s.save' %
+                      model.__name__)
+    post_delete.connect(log_reset, sender=model,
+                        dispatch_uid='djangoplugins.changes.%s.delete' %
+                        model.__name__)
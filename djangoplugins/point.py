@@ -1,12 +1,24 @@
 from __future__ import absolute_import
 
-from django import VERSION as django_version
+from django.conf import settings
+from django.utils.http import urlquote
 from django.utils.translation import ugettext_lazy as _
 from django.core.exceptions import ObjectDoesNotExist
+from django.http import Http404
 from django.utils import six
 
 from .models import Plugin, PluginPoint as PluginPointModel, ENABLED
-from .utils import get_plugin_name, db_table_exists
+from . import breaker
+from .backends import get_backend
+from .registry import registry, get_request_plugins
+from .utils import get_plugin_name, get_url_templates, url_names
+
+try:
+    from django.urls import get_resolver, get_script_prefix, get_urlconf, \
+        NoReverseMatch
+except ImportError:  # Django < 1.10
+    from django.core.urlresolvers import get_resolver, get_script_prefix, \
+        get_urlconf, NoReverseMatch
 
 
 _PLUGIN_POINT = "<class 'djangoplugins.point.PluginPoint'>"
@@ -47,6 +59,15 @@ class PluginMount(type):
 
 
 class PluginPoint(six.with_metaclass(PluginMount, object)):
+    def get_config(self):
+        """
+        Returns plugin config dict, loaded together with plugin state.
+        """
+        record = getattr(self, '_plugin_record', None)
+        if record is None:
+            record = type(self)._get_record()
+        return record.get_config()
+
     @classmethod
     def get_pythonpath(cls):
         return get_plugin_name(cls)
@@ -57,13 +78,14 @@ class PluginPoint(six.with_metaclass(PluginMount, object)):
             raise Exception(_('This method is only available to plugin '
                               'classes.'))
         else:
-            return cls.get_model().is_active()
+            return cls._get_record().is_active()
 
     @classmethod
     def get_model(cls, name=None, status=ENABLED):
         """
         Returns model instance of plugin point or plugin, depending from which
-        class this methos is called.
+        class this methos is called. Storage backends, which do not use
+        database, return ``PluginRecord`` of plugin instead.
 
         Example::
 
@@ -73,21 +95,117 @@ class PluginPoint(six.with_metaclass(PluginMount, object)):
 
         """
         ppath = cls.get_pythonpath()
+        backend = get_backend()
         if is_plugin_point(cls):
             if name is not None:
-                kwargs = {}
-                if status is not None:
-                    kwargs['status'] = status
-                return Plugin.objects.get(point__pythonpath=ppath,
-                                          name=name, **kwargs)
+                return backend.get_model(ppath, name, status)
             else:
-                return PluginPointModel.objects.get(pythonpath=ppath)
+                return backend.get_point_model(ppath)
+        else:
+            return backend.get_model(ppath)
+
+    @classmethod
+    def _get_record(cls, name=None, status=ENABLED):
+        """
+        Same as ``get_model``, but returns ``PluginRecord`` of a plugin from
+        plugin registry cache, if it is enabled, or from storage backend.
+        """
+        if registry.is_enabled():
+            source = registry.get_snapshot()
         else:
-            return Plugin.objects.get(pythonpath=ppath)
+            source = get_backend()
+        if is_plugin_point(cls):
+            return source.get_record_by_name(cls.get_pythonpath(), name,
+                                             status)
+        else:
+            return source.get_record(cls.get_pythonpath())
+
+    @classmethod
+    def get_plugin(cls, name=None, status=ENABLED, scope=None):
+        """
+        Returns plugin instance of plugin point by name or of plugin class.
+        If ``scope`` is given, plugin must be enabled within that scope.
+        """
+        if scope is not None:
+            if name is None or status != ENABLED:
+                raise Exception(_('Only enabled plugins can be looked up '
+                                  'by name within a scope.'))
+            for plugin_record in cls._get_records(scope):
+                if plugin_record.name == name:
+                    return registry.get_plugin(plugin_record)
+            raise Plugin.DoesNotExist(name)
+
+        request_plugins = get_request_plugins()
+        if request_plugins is not None and is_plugin_point(cls) and \
+                name is not None and status == ENABLED:
+            return request_plugins[cls][name]
+        if is_plugin_point(cls) and name is None:
+            return cls.get_model().get_plugin()
+        return cls._get_record(name, status).get_plugin()
+
+    @classmethod
+    def get_plugin_or_none(cls, name, scope=None):
+        """
+        Returns enabled plugin instance by name or ``None``. Names, that were
+        not found, are remembered until plugin registry changes, so repeated
+        lookups of unknown names do not query database.
+        """
+        if not is_plugin_point(cls):
+            raise Exception(_('This method is only available to plugin point '
+                              'classes.'))
+        pythonpath = cls.get_pythonpath()
+        if registry.is_missing(pythonpath, name, scope):
+            return None
+        try:
+            return cls.get_plugin(name, scope=scope)
+        except ObjectDoesNotExist:
+            registry.set_missing(pythonpath, name, scope)
+            return None
+
+    @classmethod
+    def get_plugin_or_404(cls, name, scope=None):
+        """
+        Same as ``get_plugin_or_none``, but raises ``Http404``, if plugin is
+        not found.
+        """
+        plugin = cls.get_plugin_or_none(name, scope)
+        if plugin is None:
+            raise Http404('No %s plugin matches the given name.' %
+                          cls.__name__)
+        return plugin
 
     @classmethod
-    def get_plugin(cls, name=None, status=ENABLED):
-        return cls.get_model(name, status).get_plugin()
+    def reverse(cls, plugin, name, args=None, kwargs=None):
+        """
+        Returns URL ``name`` of ``plugin`` (instance, class or plugin name),
+        included with ``include_plugins(point, namespace=...)``.
+        """
+        if not is_plugin_point(cls):
+            raise Exception(_('This method is only available to plugin point '
+                              'classes.'))
+        plugin = getattr(plugin, 'name', plugin)
+        key = (plugin, name)
+        urlconf = get_urlconf() or settings.ROOT_URLCONF
+        if key not in url_names.get(cls.get_pythonpath(), {}):
+            # Make sure URLconf, which calls include_plugins, was imported.
+            get_resolver(urlconf).url_patterns
+        try:
+            templates = get_url_templates(
+                url_names[cls.get_pythonpath()][key], urlconf)
+        except KeyError:
+            raise NoReverseMatch("URL '%s' of plugin '%s' is not included "
+                                 "with a namespace." % (name, plugin))
+        for template in templates:
+            path = template.format(args or (), kwargs or {})
+            if path is not None:
+                url = urlquote(get_script_prefix() + path,
+                               safe="!$&'()*+,;=/~:@")
+                if url.startswith('//'):
+                    # Do not build scheme relative URLs.
+                    url = '/%2F' + url[2:]
+                return url
+        raise NoReverseMatch("URL '%s' of plugin '%s' does not match given "
+                             "arguments." % (name, plugin))
 
     @classmethod
     def get_point(cls):
@@ -113,28 +231,62 @@ class PluginPoint(six.with_metaclass(PluginMount, object)):
                 get(plugin__pythonpath=cls.get_pythonpath())
 
     @classmethod
-    def get_plugins(cls):
+    def _get_records(cls, scope=None, implementing=None):
+        """
+        Returns ordered ``PluginRecord`` list of enabled plugins of plugin
+        point, from registry cache, if it is enabled.
+        """
+        if registry.is_enabled():
+            snapshot = registry.get_snapshot()
+            return snapshot.get_plugins(cls.get_pythonpath(), scope,
+                                        implementing)
+        records = get_backend().get_records(cls.get_pythonpath(), scope)
+        if implementing is not None:
+            records = [record for record in records
+                       if registry.implements(record.pythonpath,
+                                              implementing)]
+        return records
+
+    @classmethod
+    def get_plugins(cls, scope=None, implementing=None):
         """
         Returns all plugin instances of plugin point, passing all args and
         kwargs to plugin constructor.
+
+        If ``scope`` is given, returns plugins enabled within that scope. If
+        ``implementing`` is given, returns only plugins, whose class defines
+        attribute of that name, without creating instances of other plugins.
         """
-        # Django >= 1.9 changed something with the migration logic causing
-        # plugins to be executed before the corresponding database tables
-        # exist. This method will only return something if the database
-        # tables have already been created.
-        # XXX: I don't fully understand the issue and there should be
-        # another way but this appears to work fine.
-        if django_version >= (1, 9) and \
-                not db_table_exists(Plugin._meta.db_table):
-            raise StopIteration
+        request_plugins = get_request_plugins()
+        if request_plugins is not None and is_plugin_point(cls) and \
+                scope in (None, request_plugins.scope):
+            for plugin in request_plugins[cls]:
+                if implementing is None or hasattr(plugin, implementing):
+                    yield plugin
+            return
 
         if is_plugin_point(cls):
-            for plugin_model in cls.get_plugins_qs():
-                yield plugin_model.get_plugin()
+            for plugin_record in cls._get_records(scope, implementing):
+                yield registry.get_plugin(plugin_record)
         else:
             raise Exception(_('This method is only available to plugin point '
                               'classes.'))
 
+    @classmethod
+    def dispatch(cls, method, args=(), kwargs=None, budget=None,
+                 scope=None):
+        """
+        Calls ``method`` of each enabled plugin, which implements it, with
+        ``args`` and ``kwargs``, and returns list of ``(plugin, result)``
+        pairs. Plugins are skipped by circuit breakers, if enabled, and when
+        ``budget`` seconds are spent.
+        """
+        if not is_plugin_point(cls):
+            raise Exception(_('This method is only available to plugin point '
+                              'classes.'))
+        plugins = cls.get_plugins(scope=scope, implementing=method)
+        return breaker.dispatch(plugins, method, args, kwargs, budget)
+
     @classmethod
     def get_plugins_qs(cls):
         """
@@ -161,7 +313,7 @@ class PluginPoint(six.with_metaclass(PluginMount, object)):
             raise Exception(_('This method is only available to plugin '
                               'classes.'))
         else:
-            return cls.get_model().name
+            return cls._get_record().name
 
     @classmethod
     def get_title(cls):
@@ -169,4 +321,30 @@ class PluginPoint(six.with_metaclass(PluginMount, object)):
             raise Exception(_('This method is only available to plugin '
                               'classes.'))
         else:
-            return cls.get_model().title
+            return cls._get_record().title
+
+
+def get_plugins_for(points, scope=None):
+    """
+    Returns lists of enabled plugin instances of each of given plugin point
+    classes, in the same order, resolving all points with a single query or
+    registry cache read::
+
+        menus, sidebars = get_plugins_for([MenuPoint, SidebarPoint])
+
+    """
+    pythonpaths = [get_plugin_name(point) for point in points]
+    request_plugins = get_request_plugins()
+    if request_plugins is not None and scope in (None, request_plugins.scope):
+        request_plugins.prefetch(pythonpaths)
+        return [list(request_plugins[pythonpath])
+                for pythonpath in pythonpaths]
+
+    if registry.is_enabled():
+        snapshot = registry.get_snapshot()
+        records = dict((pythonpath, snapshot.get_plugins(pythonpath, scope))
+                       for pythonpath in pythonpaths)
+    else:
+        records = get_backend().get_records_for(pythonpaths, scope)
+    return [[registry.get_plugin(record) for record in records[pythonpath]]
+            for pythonpath in pythonpaths]
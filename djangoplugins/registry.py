@@ -0,0 +1,531 @@
+from __future__ import absolute_import
+
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from django.db import connections, transaction
+from django.db.models.signals import post_save, post_delete
+from django.utils import six
+
+from .backends import get_backend
+from .models import Plugin, PluginPoint, PluginScopeStatus, ScopeStatus, \
+    ENABLED, REMOVED, RESET, is_changed
+from .stats import stats
+from .utils import get_setting, get_plugin_name, get_plugin_from_string, \
+    LRUCache
+
+try:
+    from django.core.cache import caches
+
+    def get_cache():
+        return caches[get_setting('CACHE', 'default')]
+except ImportError:  # Django < 1.7
+    from django.core.cache import get_cache as _get_cache
+
+    def get_cache():
+        return _get_cache(get_setting('CACHE', 'default'))
+
+
+VERSION_KEY = 'djangoplugins:registry:version'
+
+logger = logging.getLogger('djangoplugins')
+
+
+def get_version():
+    """
+    Returns current plugin registry version, shared through Django cache
+    between all processes.
+    """
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Key was never set or was evicted, start from a value, that can not
+        # match any version seen before.
+        cache.add(VERSION_KEY, int(time.time() * 1000), None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_version():
+    """
+    Invalidates all cached plugin state in all processes.
+    """
+    cache = get_cache()
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        get_version()
+
+
+def bump_version_on_commit(using=None):
+    """
+    Bumps registry version once the current transaction on ``using``
+    database is committed, so that other processes do not reload state,
+    which is not visible to them yet. Without ``transaction.on_commit``
+    (Django < 1.9) the version is bumped immediately.
+    """
+    if hasattr(transaction, 'on_commit'):
+        transaction.on_commit(bump_version, using=using)
+    else:
+        bump_version()
+
+
+class Snapshot(object):
+    """
+    Immutable state of all plugins, loaded from backend at once.
+
+    ``plugins``
+        plugin records by plugin pythonpath, regardless of status.
+
+    ``points``
+        ordered lists of enabled plugin records by point pythonpath.
+
+    ``names``
+        plugin records by ``(point pythonpath, plugin name)``.
+
+    ``members``
+        ordered dicts of plugin records by id by point pythonpath,
+        regardless of status.
+
+    ``scopes``
+        ``ScopeStatus`` by scope, loaded on first use of each scope.
+
+    ``capabilities``
+        ordered lists of enabled plugin records, which implement an
+        attribute, by ``(point pythonpath, scope, attribute)``, filled on
+        first use.
+
+    Snapshot is built from ordered ``(point pythonpath, PluginRecord)``
+    pairs, returned by ``backend``. ``seq`` is sequence number of the last
+    ``PluginChange`` included. ``stale_since`` is set, when snapshot is
+    served after registry version changed.
+    """
+
+    def __init__(self, version, rows=(), seq=None, backend=None):
+        self.version = version
+        self.stale_since = None
+        self.seq = seq
+        self.backend = backend
+        self.rows = list(rows)
+        self.plugins = {}
+        self.points = {}
+        self.names = {}
+        self.members = {}
+        self.available = {}
+        self.positions = {}
+        self.scopes = {}
+        self.capabilities = {}
+        for point_pythonpath, plugin in self.rows:
+            self.plugins[plugin.pythonpath] = plugin
+            self.names[(point_pythonpath, plugin.name)] = plugin
+            self.members.setdefault(point_pythonpath, OrderedDict())[
+                plugin.id] = plugin
+            self.positions[plugin.id] = len(self.positions)
+            if plugin.status == ENABLED:
+                self.points.setdefault(point_pythonpath, []).append(plugin)
+            if plugin.status != REMOVED:
+                self.available.setdefault(point_pythonpath, []).\
+                    append(plugin)
+
+    def get_scope_status(self, scope):
+        try:
+            return self.scopes[scope]
+        except KeyError:
+            rows = self.backend.get_scope_rows(scope)
+            scope_status = self.scopes[scope] = \
+                ScopeStatus(self.positions, rows)
+            return scope_status
+
+    def get_plugins(self, point_pythonpath, scope=None, implementing=None):
+        if implementing is not None:
+            key = (point_pythonpath, scope, implementing)
+            try:
+                return self.capabilities[key]
+            except KeyError:
+                plugins = self.capabilities[key] = [
+                    plugin for plugin in
+                    self.get_plugins(point_pythonpath, scope)
+                    if registry.implements(plugin.pythonpath, implementing)]
+                return plugins
+        if scope is None:
+            return self.points.get(point_pythonpath, [])
+        scope_status = self.get_scope_status(scope)
+        return [plugin for plugin in
+                self.available.get(point_pythonpath, [])
+                if scope_status.is_enabled(plugin)]
+
+    def get_members(self, point_pythonpath):
+        return self.members.get(point_pythonpath, OrderedDict())
+
+    def get_record(self, pythonpath):
+        try:
+            return self.plugins[pythonpath]
+        except KeyError:
+            raise Plugin.DoesNotExist(pythonpath)
+
+    def get_record_by_name(self, point_pythonpath, name, status=ENABLED):
+        plugin = self.names.get((point_pythonpath, name))
+        if plugin is None or (status is not None and plugin.status != status):
+            raise Plugin.DoesNotExist(name)
+        return plugin
+
+
+class PluginRegistry(object):
+    """
+    Process wide cache of plugin state.
+
+    Enabled with ``DJANGOPLUGINS_REGISTRY_CACHE`` setting. When enabled,
+    ``PluginPoint.get_plugins()`` and related lookups are served from one
+    in-memory snapshot, which is reloaded only when registry version changes.
+
+    If ``DJANGOPLUGINS_MAX_STALENESS`` setting is set, outdated snapshot is
+    served for at most that many seconds, while one background thread of
+    the process reloads it.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.snapshot = None
+        self.worker = None
+        self.worker_pid = None
+        self.pending = threading.Event()
+        self.classes = {}
+        self.attributes = {}
+        self.missing = None
+        self.missing_version = None
+
+    def is_enabled(self):
+        return get_setting('REGISTRY_CACHE', False)
+
+    def clear(self):
+        self.snapshot = None
+
+    def get_class(self, pythonpath):
+        try:
+            return self.classes[pythonpath]
+        except KeyError:
+            cls = self.classes[pythonpath] = \
+                get_plugin_from_string(pythonpath)
+            return cls
+
+    def implements(self, pythonpath, attribute):
+        """
+        Returns if plugin class defines ``attribute``. Attribute names of each
+        class are collected once.
+        """
+        try:
+            attributes = self.attributes[pythonpath]
+        except KeyError:
+            attributes = self.attributes[pythonpath] = \
+                frozenset(dir(self.get_class(pythonpath)))
+        return attribute in attributes
+
+    def get_snapshot(self):
+        version = get_version()
+        backend = get_backend()
+        snapshot = self.snapshot
+        if snapshot is not None and snapshot.version != version and \
+                snapshot.backend is backend and self.serve_stale(snapshot):
+            return snapshot
+        if snapshot is None or snapshot.version != version or \
+                snapshot.backend is not backend:
+            with self.lock:
+                snapshot = self.snapshot
+                if snapshot is None or snapshot.version != version or \
+                        snapshot.backend is not backend:
+                    snapshot = self.refresh(version, backend)
+        return snapshot
+
+    def serve_stale(self, snapshot):
+        """
+        Returns if outdated ``snapshot`` may be served, scheduling its
+        reload in background.
+        """
+        max_staleness = get_setting('MAX_STALENESS')
+        if not max_staleness:
+            return False
+        now = time.time()
+        if snapshot.stale_since is None:
+            snapshot.stale_since = now
+        if now - snapshot.stale_since > max_staleness:
+            return False
+        self.schedule_refresh()
+        return True
+
+    def schedule_refresh(self):
+        """
+        Wakes up background refresh thread, starting it, if it is not
+        running in this process yet. Refresh requests made, while the
+        thread is busy, are served by a single reload.
+        """
+        with self.lock:
+            if self.worker is None or self.worker_pid != os.getpid() or \
+                    not self.worker.is_alive():
+                self.worker = threading.Thread(target=self.work,
+                                               name='djangoplugins-registry')
+                self.worker.daemon = True
+                self.worker_pid = os.getpid()
+                self.worker.start()
+        self.pending.set()
+
+    def work(self):
+        while True:
+            self.pending.wait()
+            self.pending.clear()
+            try:
+                self.revalidate()
+            except Exception:
+                logger.exception('Plugin registry refresh failed.')
+            finally:
+                for connection in connections.all():
+                    connection.close()
+
+    def revalidate(self):
+        """
+        Reloads snapshot, if registry version changed.
+        """
+        with self.lock:
+            version = get_version()
+            backend = get_backend()
+            snapshot = self.snapshot
+            if snapshot is None or snapshot.version != version or \
+                    snapshot.backend is not backend:
+                self.refresh(version, backend)
+
+    def refresh(self, version, backend):
+        """
+        Applies plugin changes logged since current snapshot was loaded,
+        falling back to full reload, when there are too many changes or
+        something else than plugins changed.
+        """
+        snapshot = self.snapshot
+        if snapshot is None or snapshot.seq is None or \
+                snapshot.backend is not backend:
+            return self.load(version)
+
+        limit = get_setting('CHANGE_LOG_LIMIT', 1000)
+        changes = backend.get_changes(snapshot.seq, limit + 1)
+        if not changes or len(changes) > limit or \
+                any(action == RESET for seq, pythonpath, action in changes):
+            # Version changed without a logged change after the snapshot,
+            # when a change with lower sequence number was committed after
+            # the snapshot was loaded.
+            return self.load(version)
+
+        # Sequence numbers are taken before commit, so a change missing
+        # between the read ones may still be committed. Keep the snapshot
+        # before the first gap, so that it is read again next time. Gaps
+        # left by rolled back transactions are cleared by full reload, once
+        # more than the limit of changes is read.
+        seq = snapshot.seq
+        for change_seq, pythonpath, action in changes:
+            if change_seq != seq + 1:
+                break
+            seq = change_seq
+
+        pythonpaths = set(pythonpath for seq, pythonpath, action in changes)
+        rows = [row for row in snapshot.rows
+                if row[1].pythonpath not in pythonpaths]
+        rows.extend(backend.get_rows(pythonpaths))
+        rows.sort(key=lambda row: (row[1].index, row[1].id))
+        self.snapshot = Snapshot(version, rows, seq, backend)
+        return self.snapshot
+
+    def load(self, version=None):
+        """
+        Loads all plugins with pythonpaths of their points from backend
+        (using a single query for database), remembering last plugin change
+        sequence number.
+        """
+        if version is None:
+            version = get_version()
+        backend = get_backend()
+        seq = backend.get_last_seq()
+        self.snapshot = Snapshot(version, backend.get_rows(), seq, backend)
+        return self.snapshot
+
+    def warm_up(self):
+        """
+        Loads snapshot and imports classes of all enabled plugins, so that
+        first requests do not have to.
+        """
+        snapshot = self.load()
+        for plugins in snapshot.points.values():
+            for plugin in plugins:
+                try:
+                    self.get_class(plugin.pythonpath)
+                except (ImportError, AttributeError):
+                    # Plugin was removed from code, but not synced yet.
+                    pass
+        return snapshot
+
+    def create(self, pythonpath):
+        """
+        Returns new instance of plugin class, instrumented when
+        ``DJANGOPLUGINS_STATS`` is enabled.
+        """
+        plugin = self.get_class(pythonpath)()
+        if stats.is_enabled():
+            stats.instrument(plugin)
+        return plugin
+
+    def get_plugin(self, plugin):
+        instance = self.create(plugin.pythonpath)
+        instance._plugin_record = plugin
+        return instance
+
+    def get_missing(self):
+        """
+        Returns cache of plugin names, which were not found, valid for
+        current registry version.
+        """
+        version = get_version()
+        if self.missing is None or self.missing_version != version:
+            self.missing = LRUCache(get_setting('NEGATIVE_CACHE_SIZE', 1000))
+            self.missing_version = version
+        return self.missing
+
+    def is_missing(self, point_pythonpath, name, scope=None):
+        return self.get_missing().get((point_pythonpath, name, scope), False)
+
+    def set_missing(self, point_pythonpath, name, scope=None):
+        self.get_missing().set((point_pythonpath, name, scope), True)
+
+
+registry = PluginRegistry()
+
+
+class PointPlugins(object):
+    """
+    Enabled plugin instances of one plugin point, resolved for one request.
+
+    Iterating yields plugin instances in order, indexing by name returns one
+    plugin instance or raises ``Plugin.DoesNotExist``.
+    """
+
+    def __init__(self, models):
+        self.plugins = []
+        self.names = {}
+        self.pythonpaths = {}
+        for model in models:
+            plugin = registry.get_plugin(model)
+            self.plugins.append(plugin)
+            self.names[model.name] = plugin
+            self.pythonpaths[model.pythonpath] = plugin
+
+    def __iter__(self):
+        return iter(self.plugins)
+
+    def __len__(self):
+        return len(self.plugins)
+
+    def __getitem__(self, name):
+        try:
+            return self.names[name]
+        except KeyError:
+            raise Plugin.DoesNotExist(name)
+
+    def get(self, name, default=None):
+        return self.names.get(name, default)
+
+
+class RequestPlugins(object):
+    """
+    Lazy accessor to plugins, attached to request as ``request.plugins``.
+
+    Each plugin point is resolved at most once and all points are resolved
+    against the same registry snapshot and within the same ``scope``::
+
+        for plugin in request.plugins[ContentType]:
+            ...
+        news = request.plugins[ContentType]['news']
+
+    """
+
+    def __init__(self, scope=None):
+        self.points = {}
+        self.snapshot = None
+        self.scope = scope
+
+    def __getitem__(self, point):
+        if not isinstance(point, six.string_types):
+            point = get_plugin_name(point)
+        try:
+            return self.points[point]
+        except KeyError:
+            self.prefetch([point])
+            return self.points[point]
+
+    def prefetch(self, points):
+        """
+        Resolves all not yet resolved plugin points (classes or pythonpaths)
+        at once, using a single backend read.
+        """
+        points = [point if isinstance(point, six.string_types) else
+                  get_plugin_name(point) for point in points]
+        points = [point for point in points if point not in self.points]
+        if not points:
+            return
+        if self.snapshot is None and registry.is_enabled():
+            self.snapshot = registry.get_snapshot()
+        if self.snapshot is not None:
+            records = dict((point, self.snapshot.get_plugins(point,
+                                                             self.scope))
+                           for point in points)
+        else:
+            records = get_backend().get_records_for(points, self.scope)
+        for point in points:
+            self.points[point] = PointPlugins(records[point])
+
+    def get_instance(self, pythonpath):
+        """
+        Returns plugin instance shared within this request, if plugin point
+        of the plugin was already resolved, otherwise ``None``.
+        """
+        for plugins in six.itervalues(self.points):
+            if pythonpath in plugins.pythonpaths:
+                return plugins.pythonpaths[pythonpath]
+        return None
+
+
+_local = threading.local()
+
+
+def activate(plugins):
+    """
+    Makes ``plugins`` available to plugin lookups in current thread.
+    """
+    _local.plugins = plugins
+
+
+def deactivate():
+    _local.plugins = None
+
+
+def get_request_plugins():
+    """
+    Returns ``RequestPlugins`` of request handled by current thread or
+    ``None``.
+    """
+    return getattr(_local, 'plugins', None)
+
+
+def invalidate(sender, using=None, **kwargs):
+    bump_version_on_commit(using)
+
+
+def invalidate_saved(sender, instance, using=None, **kwargs):
+    if is_changed(instance):
+        bump_version_on_commit(using)
+
+
+for model in (Plugin, PluginPoint, PluginScopeStatus):
+    post_save.connect(invalidate_saved, sender=model,
+                      dispatch_uid='djangoplugins.registry.%s.save' %
+                      model.__name__)
+    post_delete.connect(invalidate, sender=model,
+                        dispatch_uid='djangoplugins.registry.%s.delete' %
+                        model.__name__)
@@ -1,4 +1,143 @@
+from __future__ import absolute_import
+
+import logging
+import threading
+from collections import OrderedDict
+
+from django.db import connections, transaction
 from django.dispatch import Signal
+from django.utils import six
+from django.utils.six.moves import queue
+
+from .utils import get_setting, get_plugin_name
 
 django_plugin_disabled = Signal(providing_args=["plugin"])
 django_plugin_enabled = Signal(providing_args=["plugin"])
+django_plugins_synced = Signal()
+
+logger = logging.getLogger('djangoplugins')
+
+_local = threading.local()
+
+
+class SignalWorkers(object):
+    """
+    Threads sending queued signals, started on first use.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queue = None
+
+    def submit(self, signal, sender, plugin):
+        with self.lock:
+            if self.queue is None:
+                self.queue = queue.Queue()
+                for i in range(get_setting('SIGNAL_WORKERS')):
+                    thread = threading.Thread(target=self.work,
+                                              name='djangoplugins-signals')
+                    thread.daemon = True
+                    thread.start()
+        self.queue.put((signal, sender, plugin))
+
+    def work(self):
+        while True:
+            signal, sender, plugin = self.queue.get()
+            try:
+                for receiver, response in signal.send_robust(sender=sender,
+                                                             plugin=plugin):
+                    if isinstance(response, Exception):
+                        logger.error('Receiver %r of plugin signal failed: %s',
+                                     receiver, response)
+            finally:
+                # Receivers may use database, do not keep connections of
+                # this long-lived thread open.
+                for connection in connections.all():
+                    connection.close()
+                self.queue.task_done()
+
+
+workers = SignalWorkers()
+
+
+def deliver(signal, sender, plugin):
+    if get_setting('SIGNAL_WORKERS'):
+        workers.submit(signal, sender, plugin)
+    else:
+        signal.send(sender=sender, plugin=plugin)
+
+
+class PendingSignals(object):
+    """
+    Plugin status signals of one thread and database alias, sent after
+    commit, only the last one for each plugin.
+
+    Each signal is collected into a batch by its own ``on_commit`` callback,
+    so that signals of rolled back savepoints and transactions are dropped
+    together with their callbacks. Every signal also registers a callback
+    sending the batch, which does nothing, if a later one was registered at
+    the same or an outer savepoint level, as that one runs whenever the
+    earlier does. A plugin changed both outside and inside a savepoint may
+    get a signal for each level.
+    """
+
+    def __init__(self, using):
+        self.using = using
+        self.batch = OrderedDict()
+        self.flushes = {}
+        self.last = 0
+
+    def add(self, signal, sender, plugin):
+        key = get_plugin_name(type(plugin))
+        sids = frozenset(transaction.get_connection(self.using).savepoint_ids)
+        self.last += 1
+        token = self.last
+        self.flushes = dict((t, s) for t, s in six.iteritems(self.flushes)
+                            if not sids <= s)
+        self.flushes[token] = sids
+        transaction.on_commit(
+            lambda: self.collect(key, signal, sender, plugin),
+            using=self.using)
+        transaction.on_commit(lambda: self.flush(token), using=self.using)
+
+    def collect(self, key, signal, sender, plugin):
+        self.batch.pop(key, None)
+        self.batch[key] = (signal, sender, plugin)
+
+    def flush(self, token):
+        if self.flushes.pop(token, None) is None:
+            return
+        batch, self.batch = self.batch, OrderedDict()
+        for item in batch.values():
+            deliver(*item)
+
+
+def get_pending(using):
+    pending = getattr(_local, 'pending', None)
+    if pending is None:
+        pending = _local.pending = {}
+    try:
+        return pending[using]
+    except KeyError:
+        pending_signals = pending[using] = PendingSignals(using)
+        return pending_signals
+
+
+def send_plugin_status(sender, plugin, enabled, using=None):
+    """
+    Sends ``django_plugin_enabled`` or ``django_plugin_disabled`` signal
+    for ``plugin`` instance.
+
+    With ``DJANGOPLUGINS_DEFER_SIGNALS`` setting, signals sent within a
+    transaction are queued and sent after commit, only the last one for
+    each plugin. With ``DJANGOPLUGINS_SIGNAL_WORKERS`` setting, signals are
+    sent from that many background threads.
+    """
+    signal = django_plugin_enabled if enabled else django_plugin_disabled
+    connection = transaction.get_connection(using)
+    if get_setting('DEFER_SIGNALS', False) and \
+            hasattr(transaction, 'on_commit') and \
+            connection.in_atomic_block:
+        get_pending(connection.alias).add(signal, sender, plugin)
+    else:
+        deliver(signal, sender, plugin)
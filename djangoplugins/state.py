@@ -0,0 +1,182 @@
+from __future__ import absolute_import
+
+from django.db import transaction
+from django.utils import six
+
+from .models import Plugin, PluginPoint, PluginScopeStatus, PluginChange, \
+    STATUS_CHOICES_ENABLED, RESET
+from .signals import send_plugin_status
+from .utils import get_plugin_from_string
+
+POINT_FIELDS = ('title', 'status')
+PLUGIN_FIELDS = ('name', 'title', 'index', 'status', 'config')
+
+
+def dump_state():
+    """
+    Returns state of all plugin points and plugins, keyed by pythonpath, as
+    a JSON serializable dict::
+
+        {
+            "points": {"app.plugins.MyPoint": {"title": ..., "status": 0}},
+            "plugins": {
+                "app.plugins.MyPlugin": {
+                    "point": "app.plugins.MyPoint",
+                    "name": ..., "title": ..., "index": 0, "status": 0,
+                    "scopes": {"site:1": 1}
+                }
+            }
+        }
+
+    """
+    points = dict(
+        (row[0], dict(zip(POINT_FIELDS, row[1:])))
+        for row in PluginPoint.objects.values_list('pythonpath',
+                                                   *POINT_FIELDS))
+    plugins = {}
+    rows = Plugin.objects.values_list('pythonpath', 'point__pythonpath',
+                                      *PLUGIN_FIELDS)
+    for row in rows:
+        plugin = plugins[row[0]] = dict(zip(PLUGIN_FIELDS, row[2:]))
+        plugin['point'] = row[1]
+        plugin['scopes'] = {}
+    rows = PluginScopeStatus.objects.values_list('plugin__pythonpath',
+                                                 'scope', 'status')
+    for pythonpath, scope, status in rows:
+        plugins[pythonpath]['scopes'][scope] = status
+    return {'points': points, 'plugins': plugins}
+
+
+def _update(model, pks, fields, values):
+    """
+    Updates fields of instances to new ``values`` by pythonpath, using one
+    query for each distinct set of values.
+    """
+    groups = {}
+    for pythonpath, data in six.iteritems(values):
+        key = tuple(data[field] for field in fields)
+        groups.setdefault(key, []).append(pks[pythonpath])
+    for key, group in six.iteritems(groups):
+        model.objects.filter(pk__in=group).update(**dict(zip(fields, key)))
+
+
+def _sync(model, data, fields, defaults=None):
+    """
+    Creates missing and updates changed instances of ``model`` from
+    ``data`` dict keyed by pythonpath. Returns pythonpaths of created
+    instances and new and old values of changed ones by pythonpath.
+    """
+    pks, old = {}, {}
+    changed = {}
+    rows = model.objects.filter(pythonpath__in=list(data)).\
+        values_list('pk', 'pythonpath', *fields)
+    for row in rows:
+        pks[row[1]] = row[0]
+        current = dict(zip(fields, row[2:]))
+        new = dict((field, data[row[1]].get(field, current[field]))
+                   for field in fields)
+        if new != current:
+            old[row[1]] = current
+            changed[row[1]] = new
+    created = [pythonpath for pythonpath in data if pythonpath not in pks]
+    instances = []
+    for pythonpath in created:
+        kwargs = dict((field, data[pythonpath][field])
+                      for field in fields if field in data[pythonpath])
+        if defaults is not None:
+            kwargs.update(defaults(pythonpath))
+        instances.append(model(pythonpath=pythonpath, **kwargs))
+    model.objects.bulk_create(instances)
+    _update(model, pks, fields, changed)
+    return created, changed, old
+
+
+def _sync_scopes(scoped):
+    """
+    Replaces scope statuses of plugins with ``scoped`` dicts of statuses by
+    scope by plugin pythonpath, touching only changed rows and sending no
+    model signals. Returns if anything changed.
+    """
+    plugin_pks = dict(Plugin.objects.filter(pythonpath__in=list(scoped)).
+                      values_list('pythonpath', 'pk'))
+    current = {}
+    rows = PluginScopeStatus.objects.\
+        filter(plugin__pythonpath__in=list(scoped)).\
+        values_list('pk', 'plugin__pythonpath', 'scope', 'status')
+    for pk, pythonpath, scope, status in rows:
+        current[(pythonpath, scope)] = (pk, status)
+    created, updated = [], {}
+    for pythonpath, scopes in six.iteritems(scoped):
+        for scope, status in six.iteritems(scopes):
+            pk, current_status = current.pop((pythonpath, scope),
+                                             (None, None))
+            if pk is None:
+                created.append(PluginScopeStatus(
+                    plugin_id=plugin_pks[pythonpath], scope=scope,
+                    status=status))
+            elif status != current_status:
+                updated.setdefault(status, []).append(pk)
+    deleted = [pk for pk, status in current.values()]
+    if deleted:
+        qs = PluginScopeStatus.objects.filter(pk__in=deleted)
+        if hasattr(qs, '_raw_delete'):
+            # Scope statuses have no dependent rows, delete them without
+            # a post_delete signal for each.
+            qs._raw_delete(qs.db)
+        else:  # Django < 1.9
+            qs.delete()
+    for status, pks in six.iteritems(updated):
+        PluginScopeStatus.objects.filter(pk__in=pks).update(status=status)
+    PluginScopeStatus.objects.bulk_create(created)
+    return bool(created or updated or deleted)
+
+
+def load_state(data):
+    """
+    Loads state returned by ``dump_state()`` in a single transaction,
+    creating missing and updating changed plugin points and plugins by
+    pythonpath. Plugins and points missing in ``data`` are left untouched,
+    scope statuses of loaded plugins are replaced, if given.
+
+    ``django_plugin_enabled`` and ``django_plugin_disabled`` signals are
+    sent after commit, once for each plugin, whose status was changed, and
+    registry version is bumped once. Returns number of created and changed
+    points and plugins.
+    """
+    from .registry import bump_version_on_commit
+
+    points = data.get('points', {})
+    plugins = data.get('plugins', {})
+    with transaction.atomic():
+        created, changed, old = _sync(PluginPoint, points, POINT_FIELDS)
+        count = len(created) + len(changed)
+
+        point_pks = dict(PluginPoint.objects.filter(
+            pythonpath__in=set(i['point'] for i in plugins.values())).
+            values_list('pythonpath', 'pk'))
+        created, changed, old = _sync(
+            Plugin, plugins, PLUGIN_FIELDS,
+            lambda pythonpath: {'point_id':
+                                point_pks[plugins[pythonpath]['point']]})
+        count += len(created) + len(changed)
+
+        scoped = dict((pythonpath, plugin['scopes'])
+                      for pythonpath, plugin in six.iteritems(plugins)
+                      if 'scopes' in plugin)
+        scopes_changed = _sync_scopes(scoped) if scoped else False
+        if count or scopes_changed:
+            PluginChange.objects.log([''], RESET)
+            bump_version_on_commit()
+
+    for pythonpath, new in six.iteritems(changed):
+        was_enabled = old[pythonpath]['status'] in STATUS_CHOICES_ENABLED
+        is_enabled = new['status'] in STATUS_CHOICES_ENABLED
+        if was_enabled == is_enabled:
+            continue
+        try:
+            plugin = get_plugin_from_string(pythonpath)()
+        except (ImportError, AttributeError):
+            # Plugin is not available in this code base.
+            continue
+        send_plugin_status(Plugin, plugin, is_enabled)
+    return count
@@ -0,0 +1,163 @@
+from __future__ import absolute_import
+
+import inspect
+import threading
+import time
+from functools import wraps
+
+from django.test.signals import setting_changed
+from django.utils import six
+
+from .utils import get_setting, get_plugin_name, get_plugin_from_string
+
+# Upper bounds of latency histogram buckets in seconds, last bucket counts
+# everything slower.
+BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+_missing = object()
+
+
+class MethodStats(object):
+    """
+    Call count, total and maximum latency and latency histogram of one
+    plugin method.
+    """
+
+    __slots__ = ('count', 'total', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.buckets = [0] * (len(BUCKETS) + 1)
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else 0.0
+
+    def add(self, duration):
+        self.count += 1
+        self.total += duration
+        self.max = max(self.max, duration)
+        for i, bound in enumerate(BUCKETS):
+            if duration <= bound:
+                self.buckets[i] += 1
+                break
+        else:
+            self.buckets[-1] += 1
+
+
+class PluginStats(object):
+    """
+    Process wide, in-memory latency statistics of plugin method calls.
+
+    Enabled with ``DJANGOPLUGINS_STATS`` setting. When enabled, methods of
+    plugin instances returned by plugin points are timed. Each call is also
+    passed to ``DJANGOPLUGINS_STATS_EXPORTER`` callable (or dotted path to
+    it), if set, as ``exporter(point, plugin, method, duration)``. The
+    exporter is resolved on first call.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.methods = {}
+        self.classes = {}
+        self.exporter = _missing
+
+    def is_enabled(self):
+        return get_setting('STATS', False)
+
+    def get_exporter(self):
+        exporter = self.exporter
+        if exporter is _missing:
+            exporter = get_setting('STATS_EXPORTER')
+            if isinstance(exporter, six.string_types):
+                exporter = get_plugin_from_string(exporter)
+            self.exporter = exporter
+        return exporter
+
+    def clear(self):
+        with self.lock:
+            self.methods = {}
+
+    def record(self, point, plugin, method, duration):
+        key = (point, plugin, method)
+        with self.lock:
+            try:
+                method_stats = self.methods[key]
+            except KeyError:
+                method_stats = self.methods[key] = MethodStats()
+            method_stats.add(duration)
+        exporter = self.get_exporter()
+        if exporter is not None:
+            exporter(point, plugin, method, duration)
+
+    def get_methods(self, cls):
+        """
+        Returns point pythonpath, plugin pythonpath and names of public
+        methods of plugin class.
+        """
+        try:
+            return self.classes[cls]
+        except KeyError:
+            pass
+        names = set()
+        for base in cls.__mro__:
+            for name, value in six.iteritems(vars(base)):
+                if not name.startswith('_') and inspect.isfunction(value):
+                    names.add(name)
+            if 'plugins' in vars(base):
+                # Plugin point class, methods of PluginPoint are not timed.
+                break
+        methods = self.classes[cls] = (get_plugin_name(cls.get_point()),
+                                       get_plugin_name(cls), sorted(names))
+        return methods
+
+    def instrument(self, plugin):
+        """
+        Replaces public methods of plugin instance with timed ones.
+        """
+        point, pythonpath, names = self.get_methods(type(plugin))
+        for name in names:
+            setattr(plugin, name,
+                    self.timed(point, pythonpath, name, getattr(plugin, name)))
+        return plugin
+
+    def timed(self, point, pythonpath, name, method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            start = time.time()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.record(point, pythonpath, name, time.time() - start)
+        return wrapper
+
+    def get_slowest(self, limit=10):
+        """
+        Returns ``(plugin pythonpath, method name, MethodStats)`` lists of
+        at most ``limit`` methods with highest mean latency by point
+        pythonpath.
+        """
+        with self.lock:
+            items = list(six.iteritems(self.methods))
+        points = {}
+        for (point, plugin, method), method_stats in items:
+            points.setdefault(point, []).append(
+                (plugin, method, method_stats))
+        for point, methods in six.iteritems(points):
+            methods.sort(key=lambda item: -item[2].mean)
+            del methods[limit:]
+        return points
+
+
+stats = PluginStats()
+
+
+def reset_exporter(sender, setting, **kwargs):
+    if setting == 'DJANGOPLUGINS_STATS_EXPORTER':
+        stats.exporter = _missing
+
+
+setting_changed.connect(reset_exporter,
+                        dispatch_uid='djangoplugins.stats.reset_exporter')
@@ -1,29 +1,123 @@
 from __future__ import absolute_import
 
+import hashlib
+
 from django.template import Library, Node, TemplateSyntaxError
+from django.utils import six
+from django.utils.encoding import force_bytes
 
-from ..utils import get_plugin_from_string
+from ..point import get_plugins_for
+from ..registry import get_cache, get_version
+from ..utils import get_plugin_name, get_plugin_from_string, get_setting
 
 register = Library()
 
 
+def get_point_plugins(context, point, implementing=None):
+    """
+    Returns plugins of ``point``, using ``request.plugins`` if available.
+    """
+    request_plugins = getattr(context.get('request'), 'plugins', None)
+    if request_plugins is not None:
+        plugins = request_plugins[point]
+        if implementing is not None:
+            plugins = [plugin for plugin in plugins
+                       if hasattr(plugin, implementing)]
+        return plugins
+    return point.get_plugins(implementing=implementing)
+
+
 class PluginsNode(Node):
-    def __init__(self, point_name, var_name):
-        self.plugins = get_plugin_from_string(point_name).get_plugins()
-        self.var_name = var_name
+    def __init__(self, point_names, var_names):
+        self.points = [get_plugin_from_string(i) for i in point_names]
+        self.var_names = var_names
 
     def render(self, context):
-        context[self.var_name] = self.plugins
+        if len(self.points) == 1:
+            plugins = [get_point_plugins(context, self.points[0])]
+        else:
+            request_plugins = getattr(context.get('request'), 'plugins',
+                                      None)
+            if request_plugins is not None:
+                request_plugins.prefetch(self.points)
+                plugins = [request_plugins[point] for point in self.points]
+            else:
+                plugins = get_plugins_for(self.points)
+        for var_name, point_plugins in zip(self.var_names, plugins):
+            context[var_name] = point_plugins
         return ''
 
 
 @register.tag
 def get_plugins(parser, token):
+    """
+    Sets template variables to plugins of one or more plugin points. Several
+    plugin points are resolved at once::
+
+        {% get_plugins my_app.plugins.MyPluginPoint as plugins %}
+        {% get_plugins my_app.Menu my_app.Sidebar as menu sidebar %}
+
+    """
     contents = token.split_contents()
-    if len(contents) != 4:
-        raise TemplateSyntaxError("%r tag requires exactly 3 arguments" %
+    if 'as' not in contents:
+        raise TemplateSyntaxError("%r tag requires 'as' argument" %
                                   (contents[0]))
-    if 'as' != contents[2]:
-        raise TemplateSyntaxError("%r tag 2nd argument must be 'as'" %
+    i = contents.index('as')
+    point_names, var_names = contents[1:i], contents[i + 1:]
+    if not point_names or len(point_names) != len(var_names):
+        raise TemplateSyntaxError("%r tag requires the same number of plugin "
+                                  "points and variable names" % (contents[0]))
+    return PluginsNode(point_names, var_names)
+
+
+class RenderPluginsNode(Node):
+    def __init__(self, point_name, method, vary_on):
+        self.point = get_plugin_from_string(point_name)
+        self.method = method
+        self.vary_on = vary_on
+
+    def get_cache_key(self, version, plugin, method, vary_on):
+        key = ':'.join([six.text_type(version), get_plugin_name(type(plugin)),
+                        method] + [six.text_type(i) for i in vary_on])
+        return 'djangoplugins:render:%s' % \
+            hashlib.md5(force_bytes(key)).hexdigest()
+
+    def render(self, context):
+        method = self.method.resolve(context)
+        vary_on = [i.resolve(context) for i in self.vary_on]
+        plugins = list(get_point_plugins(context, self.point, method))
+        version = get_version()
+        keys = [self.get_cache_key(version, plugin, method, vary_on)
+                for plugin in plugins]
+
+        cache = get_cache()
+        cached = cache.get_many(keys)
+        rendered = {}
+        output = []
+        for key, plugin in zip(keys, plugins):
+            if key not in cached:
+                rendered[key] = cached[key] = \
+                    six.text_type(getattr(plugin, method)(context))
+            output.append(cached[key])
+        if rendered:
+            cache.set_many(rendered, get_setting('RENDER_TIMEOUT', 300))
+        return ''.join(output)
+
+
+@register.tag
+def render_plugins(parser, token):
+    """
+    Renders all enabled plugins of a plugin point, by calling given method of
+    each plugin with template context. Output of each plugin is cached until
+    plugin registry changes. Any additional arguments are added to cache key::
+
+        {% render_plugins my_app.plugins.MyPluginPoint "render_menu" %}
+        {% render_plugins my_app.plugins.MyPluginPoint "render_menu" user.pk %}
+
+    """
+    contents = token.split_contents()
+    if len(contents) < 3:
+        raise TemplateSyntaxError("%r tag requires at least 2 arguments" %
                                   (contents[0]))
-    return PluginsNode(contents[1], contents[3])
+    return RenderPluginsNode(contents[1], parser.compile_filter(contents[2]),
+                             [parser.compile_filter(i) for i in contents[3:]])
@@ -0,0 +1,49 @@
+from __future__ import absolute_import
+
+from functools import wraps
+
+from .backends import push_backend, pop_backend
+from .backends.memory import MemoryBackend
+from .registry import bump_version
+
+
+class override_backend(object):
+    """
+    Makes all plugin lookups use given plugin state backend, a new
+    ``MemoryBackend`` by default. Can be used as context manager, returning
+    the backend, or as test method decorator, passing the backend as
+    ``plugins_backend`` keyword argument::
+
+        def test_disabled(self):
+            with override_backend() as backend:
+                backend.disable(MyPlugin)
+                self.assertEqual([], list(MyPluginPoint.get_plugins()))
+
+        @override_backend()
+        def test_enabled(self, plugins_backend):
+            plugins_backend.set_index(MyPlugin, -1)
+
+    """
+
+    def __init__(self, backend=None):
+        self.backend = backend
+
+    def __enter__(self):
+        backend = self.backend
+        if backend is None:
+            backend = MemoryBackend()
+        push_backend(backend)
+        bump_version()
+        return backend
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        pop_backend()
+        bump_version()
+
+    def __call__(self, func):
+        @wraps(func)
+        def inner(*args, **kwargs):
+            with self as backend:
+                kwargs['plugins_backend'] = backend
+                return func(*args, **kwargs)
+        return inner
@@ -1,16 +1,48 @@
 from __future__ import absolute_import
 
+import json
+import logging
+from unittest import skipIf
+
+try:
+    import jsonschema
+except ImportError:
+    jsonschema = None
+
 from django import forms
-from django.test import TestCase
+from django.conf.urls import url
+from django.db import connection, transaction
+from django.core.exceptions import ImproperlyConfigured, ValidationError
+from django.http import Http404
+from django.http import HttpResponse
+from django.template import Context, Template
+from django.test import TestCase, TransactionTestCase, RequestFactory
+from django.test.utils import CaptureQueriesContext, override_settings
 from django.utils.translation import ugettext_lazy as _
 from django.utils import six
 
+from .backends.settings import SettingsBackend
+from .breaker import breakers
+from .checks import check_registry, assert_registry_synced
+from .decorators import memoize
 from .fields import PluginChoiceField, PluginModelChoiceField, \
-    PluginModelMultipleChoiceField
-from .point import PluginMount, PluginPoint
-from .models import Plugin, PluginPoint as PluginPointModel
+    PluginModelMultipleChoiceField, PluginField, ManyPluginField
+from .point import PluginMount, PluginPoint, NoReverseMatch, \
+    get_plugins_for
+from .models import Plugin, PluginPoint as PluginPointModel, PluginRecord, \
+    PluginScopeStatus, PluginChange, PluginLock, CHANGED, DELETED, RESET
 from .models import ENABLED, DISABLED, REMOVED
+from .management import sync_plugins
 from .management.commands.syncplugins import SyncPlugins
+from .middleware import PluginsMiddleware
+from .registry import registry, get_request_plugins, bump_version, \
+    get_version
+from .testing import override_backend
+from .utils import get_plugin_name, include_plugins, url_templates
+from . import breaker, models as plugins_app, signals
+from .signals import django_plugin_disabled, django_plugin_enabled
+from .state import dump_state, load_state
+from .stats import stats
 
 
 class MyPluginPoint(PluginPoint):
@@ -21,14 +53,55 @@ class MyPlugin(MyPluginPoint):
     pass
 
 
+class MyOtherPluginPoint(PluginPoint):
+    pass
+
+
+class MyOtherPlugin(MyOtherPluginPoint):
+    name = 'my-other-plugin'
+
+
 class MyPluginFull(MyPluginPoint):
     name = 'my-plugin-full'
     title = _('My Plugin Full')
+    config_schema = {'type': 'object', 'required': ['size']}
+
+
+def plugin_view(request, plugin):
+    return HttpResponse(plugin)
 
 
 class MyPlugin2(MyPluginPoint):
     name = 'my-plugin-2'
     title = _('My Plugin 2')
+    renders = 0
+    calls = 0
+    urls = [url(r'^$', plugin_view, name='detail'),
+            url(r'^(?P<pk>\d+)/$', plugin_view, name='item')]
+
+    @memoize(maxsize=2)
+    def compute(self, value):
+        MyPlugin2.calls += 1
+        return value * 2
+
+    def fail(self, fail=True):
+        if fail:
+            raise ValueError(fail)
+        return 'ok'
+
+    def render_test(self, context):
+        MyPlugin2.renders += 1
+        return '[%s]' % context.get('value')
+
+
+def order_plugins():
+    """
+    Gives test plugins explicit indexes in the order of their classes, as
+    ids of synced plugins follow dict order of registered classes.
+    """
+    for index, plugin in enumerate([MyPlugin, MyPluginFull, MyPlugin2]):
+        Plugin.objects.filter(pythonpath=get_plugin_name(plugin)).\
+            update(index=index)
 
 
 class PluginSyncTestCaseBase(TestCase):
@@ -63,12 +136,103 @@ class PluginSyncTestCase(PluginSyncTestCaseBase):
         self.assertEqual(self.points.filter(status=ENABLED).count(), 1)
         self.assertEqual(self.plugins.filter(status=ENABLED).count(), 1)
 
+    def test_plugins_are_synced_in_chunks(self):
+        SyncPlugins(False, 0, chunk_size=1).all()
+        self.assertEqual(self.points.filter(status=ENABLED).count(), 1)
+        self.assertEqual(self.plugins.filter(status=ENABLED).count(), 1)
+        self.assertEqual(3, MyPluginPoint.get_plugins_qs().count())
+
+        Plugin.objects.filter(pythonpath='djangoplugins.tests.MyPlugin').\
+            update(status=REMOVED)
+        SyncPlugins(False, 0, chunk_size=2).all()
+        self.assertEqual(self.plugins.filter(status=ENABLED).count(), 1)
+
+    def test_check_registry(self):
+        SyncPlugins(False, 0).all()
+        with self.assertNumQueries(1):
+            self.assertEqual([], check_registry())
+
+        Plugin.objects.filter(pythonpath='djangoplugins.tests.MyPlugin2').\
+            update(name='renamed')
+        Plugin.objects.filter(pythonpath='djangoplugins.tests.MyPlugin').\
+            delete()
+        PluginPointModel.objects.filter(
+            pythonpath='djangoplugins.tests.MyPluginPoint').\
+            update(fingerprint='')
+        differences = dict((i.pythonpath, i.kind) for i in check_registry())
+        self.assertEqual({
+            'djangoplugins.tests.MyPlugin': 'missing',
+            'djangoplugins.tests.MyPlugin2': 'renamed',
+        }, differences)
+        self.assertRaises(ImproperlyConfigured, assert_registry_synced)
+
     def test_plugins_meta(self):
         SyncPlugins(False, 0).all()
         plugin_model = MyPluginPoint.get_model('my-plugin-full')
         self.assertEqual('djangoplugins.tests.MyPluginFull',
                          plugin_model.pythonpath)
 
+    def test_sync_changed_only(self):
+        SyncPlugins(False, 0).all()
+        plugins = Plugin.objects.filter(
+            pythonpath='djangoplugins.tests.MyPlugin2')
+        plugins.update(title='Changed')
+        with self.assertNumQueries(7):
+            SyncPlugins(False, 0, changed_only=True).all()
+        self.assertEqual('Changed', plugins.get().title)
+
+        PluginPointModel.objects.filter(
+            pythonpath='djangoplugins.tests.MyPluginPoint').\
+            update(fingerprint='')
+        SyncPlugins(False, 0, changed_only=True).all()
+        self.assertEqual('My Plugin 2', plugins.get().title)
+
+    @override_settings(DJANGOPLUGINS_SYNC_CHANGED_ONLY=True)
+    def test_migrate_changed_only(self):
+        SyncPlugins(False, 0).all()
+        plugins = Plugin.objects.filter(
+            pythonpath='djangoplugins.tests.MyPlugin2')
+        plugins.update(title='Changed')
+        sync_plugins(plugins_app, 0)
+        self.assertEqual('Changed', plugins.get().title)
+
+    def test_sync_unchanged(self):
+        SyncPlugins(False, 0).all()
+        version = get_version()
+        changes = PluginChange.objects.count()
+        SyncPlugins(False, 0).all()
+        self.assertEqual(version, get_version())
+        self.assertEqual(changes, PluginChange.objects.count())
+
+    @override_settings(DJANGOPLUGINS_CHANGE_LOG_LIMIT=2)
+    def test_prune_changes(self):
+        SyncPlugins(False, 0).all()
+        PluginChange.objects.log(['a', 'b', 'c', 'd'])
+        last_seq = PluginChange.objects.last_seq()
+        SyncPlugins(False, 0).all()
+        self.assertEqual(['c', 'd', ''], list(PluginChange.objects.since(0).
+                                              values_list('pythonpath',
+                                                          flat=True)))
+        self.assertEqual(RESET, PluginChange.objects.since(last_seq).
+                         get().action)
+
+    def test_sync_selected_points(self):
+        point_names = PluginPointModel.objects.filter(
+            pythonpath__startswith='djangoplugins.').\
+            values_list('pythonpath', flat=True)
+        SyncPlugins(False, 0, points=['djangoplugins.tests.MyPluginPoint']).\
+            all()
+        self.assertEqual(['djangoplugins.tests.MyPluginPoint'],
+                         list(point_names.all()))
+
+        SyncPlugins(False, 0, apps=['mycmsproject']).all()
+        self.assertEqual(1, point_names.count())
+        self.assertTrue(PluginPointModel.objects.filter(
+            pythonpath__startswith='mycmsproject.').exists())
+
+        SyncPlugins(False, 0, apps=['djangoplugins']).all()
+        self.assertEqual(2, point_names.count())
+
 
 class PluginSyncRemovedTestCase(PluginSyncTestCaseBase):
     def setUp(self):
@@ -99,8 +263,23 @@ class PluginSyncRemovedTestCase(PluginSyncTestCaseBase):
         self.assertEqual(self.points.count(), 0)
         self.assertEqual(self.plugins.count(), 0)
 
+    def test_sync_and_delete_in_chunks(self):
+        PluginMount.points = []
+        count = Plugin.objects.count()
+        with CaptureQueriesContext(connection) as queries:
+            SyncPlugins(True, 0, chunk_size=1).all()
+        self.assertEqual(self.points.count(), 0)
+        self.assertEqual(self.plugins.count(), 0)
+        self.assertEqual(count, len([
+            query for query in queries.captured_queries
+            if query['sql'].startswith('DELETE FROM "%s"' %
+                                       Plugin._meta.db_table)]))
+
 
 class PluginModelsTest(TestCase):
+    def setUp(self):
+        order_plugins()
+
     def test_plugins_of_point(self):
         qs = MyPluginPoint.get_plugins_qs()
         self.assertEqual(3, qs.count())
@@ -121,11 +300,27 @@ class PluginModelsTest(TestCase):
         point = PluginPointModel.objects.get(pythonpath=point_name)
         self.assertEqual('MyPluginPoint', six.text_type(point))
 
+    def test_plugin_records(self):
+        records = Plugin.objects.get_records_of(MyPluginPoint)
+        self.assertEqual(3, len(records))
+        self.assertTrue(all(isinstance(i, PluginRecord) for i in records))
+        self.assertFalse(hasattr(records[0], '__dict__'))
+
+        record = Plugin.objects.get_records_of(
+            'djangoplugins.tests.MyPluginPoint')[1]
+        self.assertEqual('my-plugin-full', record.name)
+        self.assertEqual(_('My Plugin Full'), six.text_type(record))
+        self.assertTrue(record.is_active())
+        self.assertTrue(isinstance(record.get_plugin(), MyPluginFull))
+
     def test_plugins_of_plugin(self):
         self.assertRaises(Exception, MyPlugin.get_plugins_qs)
 
 
 class PluginsTest(TestCase):
+    def setUp(self):
+        order_plugins()
+
     def test_get_model(self):
         point = 'djangoplugins.tests.MyPluginPoint'
         plugin = 'djangoplugins.tests.MyPluginFull'
@@ -179,6 +374,86 @@ class PluginsTest(TestCase):
         plugin_model = MyPluginPoint.get_model('my-plugin-full', status=None)
         self.assertEqual('my-plugin-full', plugin_model.name)
 
+    def test_set_status(self):
+        disabled = []
+
+        def receiver(sender, plugin, **kwargs):
+            disabled.append(plugin)
+        django_plugin_disabled.connect(receiver)
+        try:
+            count = Plugin.objects.set_status(
+                MyPluginPoint.get_plugins_qs(), DISABLED)
+        finally:
+            django_plugin_disabled.disconnect(receiver)
+
+        self.assertEqual(3, count)
+        self.assertEqual(3, len(disabled))
+        self.assertEqual(0, MyPluginPoint.get_plugins_qs().count())
+        self.assertEqual(0, Plugin.objects.set_status(
+            Plugin.objects.filter(status=DISABLED), DISABLED))
+
+    def test_set_status_of_removed_plugin(self):
+        point = MyPlugin.get_point_model()
+        Plugin.objects.create(point=point, status=REMOVED,
+                              pythonpath='djangoplugins.tests.Gone')
+        # Removed from code, but not synced yet.
+        Plugin.objects.create(point=point, status=DISABLED,
+                              pythonpath='djangoplugins.tests.Unsynced')
+        qs = Plugin.objects.filter(pythonpath__in=[
+            'djangoplugins.tests.Gone', 'djangoplugins.tests.Unsynced'])
+        self.assertEqual(1, Plugin.objects.set_status(qs, ENABLED))
+        self.assertEqual(0, Plugin.objects.set_status(qs, ENABLED))
+        self.assertEqual(REMOVED, Plugin.objects.get(
+            pythonpath='djangoplugins.tests.Gone').status)
+
+    def test_reorder(self):
+        self.assertEqual(5, Plugin.objects.reorder(Plugin.objects.all()))
+        indexes = MyPluginPoint.get_plugins_qs().\
+            values_list('index', flat=True)
+        self.assertEqual([10, 20, 30], list(indexes))
+        with self.assertNumQueries(3):
+            self.assertEqual(0, Plugin.objects.reorder(Plugin.objects.all()))
+
+    def test_get_plugins_implementing(self):
+        self.assertEqual([MyPlugin2], [
+            type(i) for i in MyPluginPoint.get_plugins(implementing='urls')])
+
+    def test_get_plugins_for(self):
+        with self.assertNumQueries(1):
+            plugins, other = get_plugins_for([MyPluginPoint,
+                                              MyOtherPluginPoint])
+        self.assertEqual([MyPlugin, MyPluginFull, MyPlugin2],
+                         [type(i) for i in plugins])
+        self.assertEqual([MyOtherPlugin], [type(i) for i in other])
+
+        with self.assertNumQueries(2):
+            plugins, other = get_plugins_for([MyPluginPoint,
+                                              MyOtherPluginPoint], 'site:1')
+        self.assertEqual(3, len(plugins))
+
+        request = RequestFactory().get('/')
+        PluginsMiddleware().process_request(request)
+        try:
+            with self.assertNumQueries(1):
+                Template('{% load plugins %}{% get_plugins '
+                         'djangoplugins.tests.MyPluginPoint '
+                         'djangoplugins.tests.MyOtherPluginPoint '
+                         'as plugins other %}').render(
+                    Context({'request': request}))
+                self.assertEqual(1, len(request.plugins[MyOtherPluginPoint]))
+        finally:
+            PluginsMiddleware().process_response(request, HttpResponse())
+
+    def test_get_plugin_or_none(self):
+        self.assertTrue(isinstance(
+            MyPluginPoint.get_plugin_or_none('my-plugin-full'), MyPluginFull))
+        self.assertEqual(None, MyPluginPoint.get_plugin_or_none('unknown'))
+        with self.assertNumQueries(0):
+            self.assertEqual(None,
+                             MyPluginPoint.get_plugin_or_none('unknown'))
+            self.assertRaises(Http404, MyPluginPoint.get_plugin_or_404,
+                              'unknown')
+
     def test_get_meta(self):
         self.assertEqual('my-plugin-full', MyPluginFull.get_name())
         self.assertEqual(_('My Plugin Full'), MyPluginFull.get_title())
@@ -212,3 +487,688 @@ class PluginsFieldsTest(TestCase):
         self.assertTrue(isinstance(cld['plugin_choice'], MyPlugin2))
         self.assertTrue(isinstance(cld['model_choice'], Plugin))
         self.assertTrue(isinstance(cld['model_multi_choice'][0], Plugin))
+
+    def test_plugin_field(self):
+        pk = MyPlugin2.get_model().pk
+        other_pk = MyOtherPlugin.get_model().pk
+        field = PluginField(MyPluginPoint)
+        field.validate(pk, None)
+        self.assertRaises(ValidationError, field.validate, other_pk, None)
+        self.assertEqual(pk, field.formfield().clean(str(pk)).pk)
+        multi_field = ManyPluginField(MyPluginPoint).formfield()
+        self.assertEqual([pk], [i.pk for i in multi_field.clean([str(pk)])])
+
+
+@override_settings(DJANGOPLUGINS_REGISTRY_CACHE=True)
+class PluginFieldsRegistryTest(TestCase):
+    def setUp(self):
+        registry.clear()
+        self.plugin = MyPlugin2.get_model()
+        self.other = MyOtherPlugin.get_model()
+
+    def tearDown(self):
+        registry.clear()
+
+    def test_validation(self):
+        field = PluginField(MyPluginPoint)
+        registry.warm_up()
+        with self.assertNumQueries(0):
+            field.validate(self.plugin.pk, None)
+            self.assertRaises(ValidationError, field.validate,
+                              self.other.pk, None)
+
+    def test_form_fields(self):
+        field = PluginField(MyPluginPoint).formfield()
+        multi_field = ManyPluginField(MyPluginPoint).formfield()
+        registry.warm_up()
+        with self.assertNumQueries(0):
+            choices = list(field.choices)
+            plugin = field.clean(str(self.plugin.pk))
+            plugins = multi_field.clean([str(self.plugin.pk)])
+            self.assertRaises(ValidationError, field.clean,
+                              str(self.other.pk))
+            self.assertRaises(ValidationError, multi_field.clean,
+                              [str(self.other.pk)])
+        self.assertEqual(MyPluginPoint.get_plugins_qs().count() + 1,
+                         len(choices))
+        self.assertTrue((self.plugin.pk, six.text_type(self.plugin))
+                        in choices)
+        self.assertEqual(self.plugin.pk, plugin.pk)
+        self.assertEqual([self.plugin.pk], [i.pk for i in plugins])
+
+
+@override_settings(DJANGOPLUGINS_REGISTRY_CACHE=True)
+class PluginRegistryTest(TransactionTestCase):
+    serialized_rollback = True
+
+    def setUp(self):
+        registry.clear()
+
+    def tearDown(self):
+        registry.clear()
+
+    def test_warm_up(self):
+        registry.warm_up()
+        with self.assertNumQueries(0):
+            plugins = list(MyPluginPoint.get_plugins())
+            plugin = MyPluginPoint.get_plugin('my-plugin-full')
+            self.assertTrue(MyPluginFull.is_active())
+            self.assertEqual('my-plugin-full', MyPluginFull.get_name())
+        self.assertEqual(3, len(plugins))
+        self.assertTrue(isinstance(plugin, MyPluginFull))
+
+    def test_incremental_refresh(self):
+        snapshot = registry.warm_up()
+        model = MyPluginFull.get_model()
+        model.title = 'Changed'
+        model.save()
+
+        changes = PluginChange.objects.since(snapshot.seq)
+        self.assertEqual([('djangoplugins.tests.MyPluginFull', CHANGED)],
+                         list(changes.values_list('pythonpath', 'action')))
+        with self.assertNumQueries(2):
+            self.assertEqual('Changed', MyPluginFull.get_title())
+        self.assertTrue(registry.snapshot.seq > snapshot.seq)
+        self.assertEqual(len(snapshot.rows), len(registry.snapshot.rows))
+
+        model.delete()
+        self.assertEqual(DELETED, PluginChange.objects.since(
+            registry.snapshot.seq).get().action)
+        self.assertEqual(2, len(list(MyPluginPoint.get_plugins())))
+
+    def test_out_of_order_changes(self):
+        snapshot = registry.warm_up()
+        pythonpath = 'djangoplugins.tests.MyPluginFull'
+        Plugin.objects.filter(pythonpath=pythonpath).update(title='Late')
+        PluginChange.objects.create(seq=snapshot.seq + 2,
+                                    pythonpath=pythonpath)
+        bump_version()
+        self.assertEqual('Late', MyPluginFull.get_title())
+        self.assertEqual(snapshot.seq, registry.snapshot.seq)
+
+        pythonpath = 'djangoplugins.tests.MyPlugin2'
+        Plugin.objects.filter(pythonpath=pythonpath).update(title='Early')
+        PluginChange.objects.create(seq=snapshot.seq + 1,
+                                    pythonpath=pythonpath)
+        bump_version()
+        self.assertEqual('Early', MyPlugin2.get_title())
+        self.assertEqual(snapshot.seq + 2, registry.snapshot.seq)
+
+    def test_implementing(self):
+        registry.warm_up()
+        plugins = list(MyPluginPoint.get_plugins(implementing='render_test'))
+        self.assertEqual([MyPlugin2], [type(i) for i in plugins])
+        self.assertEqual(['my-plugin-2'], [
+            i.name for i in registry.snapshot.capabilities[
+                ('djangoplugins.tests.MyPluginPoint', None, 'render_test')]])
+        self.assertEqual([], list(MyPluginPoint.get_plugins(
+            implementing='missing')))
+
+    @override_settings(DJANGOPLUGINS_MAX_STALENESS=60)
+    def test_stale_while_revalidate(self):
+        scheduled = []
+        registry.schedule_refresh = lambda: scheduled.append(True)
+        try:
+            snapshot = registry.warm_up()
+            model = MyPluginFull.get_model()
+            model.status = DISABLED
+            model.save()
+
+            with self.assertNumQueries(0):
+                self.assertTrue(MyPluginFull.is_active())
+            self.assertTrue(registry.snapshot is snapshot)
+            self.assertTrue(scheduled)
+
+            registry.revalidate()
+            self.assertFalse(MyPluginFull.is_active())
+
+            model.status = ENABLED
+            model.save()
+            registry.snapshot.stale_since = 0
+            self.assertTrue(MyPluginFull.is_active())
+        finally:
+            del registry.schedule_refresh
+
+    def test_invalidation(self):
+        registry.warm_up()
+        model = MyPluginFull.get_model()
+        model.status = DISABLED
+        model.save()
+
+        self.assertFalse(MyPluginFull.is_active())
+        self.assertEqual(2, len(list(MyPluginPoint.get_plugins())))
+        self.assertRaises(Plugin.DoesNotExist,
+                          MyPluginPoint.get_plugin, 'my-plugin-full')
+
+    def test_renamed(self):
+        registry.warm_up()
+        model = MyPluginFull.get_model()
+        model.name = 'unknown'
+        model.save()
+        self.assertTrue(isinstance(
+            MyPluginPoint.get_plugin_or_404('unknown'), MyPluginFull))
+
+
+class PluginsMiddlewareTest(TestCase):
+    def test_request_plugins(self):
+        request = RequestFactory().get('/')
+        middleware = PluginsMiddleware()
+        middleware.process_request(request)
+        try:
+            with self.assertNumQueries(1):
+                plugins = list(request.plugins[MyPluginPoint])
+                self.assertEqual(plugins, list(MyPluginPoint.get_plugins()))
+                plugin = MyPluginPoint.get_plugin('my-plugin-full')
+                template = Template('{% load plugins %}{% get_plugins '
+                                    'djangoplugins.tests.MyPluginPoint as p %}'
+                                    '{{ p|length }}')
+                output = template.render(Context({'request': request}))
+            self.assertEqual(3, len(plugins))
+            self.assertTrue(plugin is request.plugins[MyPluginPoint][
+                'my-plugin-full'])
+            self.assertTrue(plugin is MyPluginFull.get_model().get_plugin())
+            self.assertEqual('3', output)
+            self.assertRaises(Plugin.DoesNotExist,
+                              lambda: request.plugins[MyPluginPoint]['none'])
+        finally:
+            middleware.process_response(request, HttpResponse())
+        self.assertTrue(get_request_plugins() is None)
+
+
+class RenderPluginsTagTest(TransactionTestCase):
+    serialized_rollback = True
+
+    def render(self, value):
+        template = Template('{% load plugins %}{% render_plugins '
+                            'djangoplugins.tests.MyPluginPoint "render_test" '
+                            'value %}')
+        return template.render(Context({'value': value}))
+
+    def test_render_plugins(self):
+        MyPlugin2.renders = 0
+        self.assertEqual('[1]', self.render(1))
+        self.assertEqual('[1]', self.render(1))
+        self.assertEqual(1, MyPlugin2.renders)
+        self.assertEqual('[2]', self.render(2))
+        self.assertEqual(2, MyPlugin2.renders)
+
+        model = MyPlugin2.get_model()
+        model.status = DISABLED
+        model.save()
+        self.assertEqual('', self.render(1))
+
+        model.status = ENABLED
+        model.save()
+        self.assertEqual('[1]', self.render(1))
+        self.assertEqual(3, MyPlugin2.renders)
+
+
+class PluginScopeTest(TestCase):
+    def setUp(self):
+        registry.clear()
+        order_plugins()
+        PluginScopeStatus.objects.create(plugin=MyPluginFull.get_model(),
+                                         scope='tenant', status=DISABLED)
+        model = MyPlugin2.get_model()
+        model.status = DISABLED
+        model.save()
+        PluginScopeStatus.objects.create(plugin=model, scope='tenant',
+                                         status=ENABLED)
+
+    def tearDown(self):
+        registry.clear()
+
+    def assertScopedPlugins(self):
+        plugins = [type(i) for i in MyPluginPoint.get_plugins(scope='tenant')]
+        self.assertEqual([MyPlugin, MyPlugin2], plugins)
+        plugins = [type(i) for i in MyPluginPoint.get_plugins()]
+        self.assertEqual([MyPlugin, MyPluginFull], plugins)
+        self.assertTrue(isinstance(
+            MyPluginPoint.get_plugin('my-plugin-2', scope='tenant'),
+            MyPlugin2))
+        self.assertRaises(Plugin.DoesNotExist, MyPluginPoint.get_plugin,
+                          'my-plugin-full', scope='tenant')
+
+    def test_scoped_plugins(self):
+        self.assertScopedPlugins()
+
+    @override_settings(DJANGOPLUGINS_REGISTRY_CACHE=True)
+    def test_scoped_plugins_cached(self):
+        self.assertScopedPlugins()
+        with self.assertNumQueries(0):
+            self.assertScopedPlugins()
+
+
+class MemoryBackendTest(TestCase):
+    def setUp(self):
+        order_plugins()
+
+    def assertPlugins(self, expected, **kwargs):
+        self.assertEqual(expected, [type(i) for i in
+                                    MyPluginPoint.get_plugins(**kwargs)])
+
+    @override_backend()
+    def test_memory_backend(self, plugins_backend):
+        with self.assertNumQueries(0):
+            self.assertPlugins([MyPlugin, MyPluginFull, MyPlugin2])
+            plugins_backend.disable(MyPluginFull)
+            plugins_backend.set_index(MyPlugin, 10)
+            self.assertPlugins([MyPlugin2, MyPlugin])
+            self.assertFalse(MyPluginFull.is_active())
+            self.assertEqual('my-plugin-2', MyPlugin2.get_name())
+
+            plugins_backend.disable(MyPlugin2, scope='tenant')
+            self.assertPlugins([MyPlugin], scope='tenant')
+            self.assertRaises(Plugin.DoesNotExist, MyPluginPoint.get_plugin,
+                              'my-plugin-full')
+
+    @override_settings(DJANGOPLUGINS_REGISTRY_CACHE=True)
+    def test_memory_backend_cached(self):
+        registry.clear()
+        with override_backend() as backend:
+            backend.disable(MyPlugin)
+            with self.assertNumQueries(0):
+                self.assertPlugins([MyPluginFull, MyPlugin2])
+        self.assertPlugins([MyPlugin, MyPluginFull, MyPlugin2])
+        registry.clear()
+
+    @override_settings(DJANGOPLUGINS_STATE={'plugins': {
+        'djangoplugins.tests.MyPlugin': {'status': DISABLED},
+        'djangoplugins.tests.MyPlugin2': {
+            'index': -1, 'scopes': {'tenant': DISABLED}},
+    }})
+    def test_settings_backend(self):
+        with override_backend(SettingsBackend()) as backend:
+            with self.assertNumQueries(0):
+                self.assertPlugins([MyPlugin2, MyPluginFull])
+                self.assertPlugins([MyPluginFull], scope='tenant')
+                self.assertEqual(DISABLED, MyPlugin.get_model().status)
+                self.assertEqual('my-plugin-2', MyPluginPoint.get_model(
+                    'my-plugin-2').name)
+            self.assertRaises(TypeError, backend.disable, MyPluginFull)
+
+
+class MemoizeTest(TestCase):
+    def test_memoize(self):
+        MyPlugin2.calls = 0
+        plugin = MyPluginPoint.get_plugin('my-plugin-2')
+        self.assertEqual(4, plugin.compute(2))
+        self.assertEqual(4, MyPlugin2().compute(2))
+        self.assertEqual(1, MyPlugin2.calls)
+        self.assertEqual([1, 1], plugin.compute([1]))
+        self.assertEqual(2, MyPlugin2.calls)
+
+        model = MyPlugin2.get_model()
+        model.status = DISABLED
+        model.save()
+        self.assertEqual(4, plugin.compute(2))
+        self.assertEqual(3, MyPlugin2.calls)
+
+        SyncPlugins(False, 0).all()
+        self.assertEqual(4, plugin.compute(2))
+        self.assertEqual(4, MyPlugin2.calls)
+
+
+exported = []
+
+
+def export_stats(point, plugin, method, duration):
+    exported.append((point, plugin, method))
+
+
+@override_settings(DJANGOPLUGINS_STATS=True,
+                   DJANGOPLUGINS_STATS_EXPORTER=export_stats)
+class PluginStatsTest(TestCase):
+    def setUp(self):
+        stats.clear()
+        del exported[:]
+
+    def test_stats(self):
+        plugin = MyPluginPoint.get_plugin('my-plugin-2')
+        self.assertTrue(isinstance(plugin, MyPlugin2))
+        plugin.render_test({'value': 1})
+        for plugin in MyPluginPoint.get_plugins():
+            if isinstance(plugin, MyPlugin2):
+                plugin.render_test({})
+
+        point = 'djangoplugins.tests.MyPluginPoint'
+        pythonpath = 'djangoplugins.tests.MyPlugin2'
+        self.assertEqual([(point, pythonpath, 'render_test')] * 2, exported)
+        slowest = stats.get_slowest()
+        self.assertEqual([point], list(slowest))
+        self.assertEqual([(pythonpath, 'render_test')],
+                         [i[:2] for i in slowest[point]])
+        method_stats = slowest[point][0][2]
+        self.assertEqual(2, method_stats.count)
+        self.assertEqual(2, sum(method_stats.buckets))
+
+    def test_exporter_changed(self):
+        self.assertTrue(stats.get_exporter() is export_stats)
+        with override_settings(DJANGOPLUGINS_STATS_EXPORTER=None):
+            self.assertEqual(None, stats.get_exporter())
+        self.assertTrue(stats.get_exporter() is export_stats)
+
+
+class PluginStateTest(TransactionTestCase):
+    serialized_rollback = True
+
+    def test_dump_and_load(self):
+        data = dump_state()
+        pythonpath = 'djangoplugins.tests.MyPlugin2'
+        point = 'djangoplugins.tests.MyPluginPoint'
+        self.assertEqual(point, data['plugins'][pythonpath]['point'])
+        self.assertEqual(ENABLED, data['plugins'][pythonpath]['status'])
+        self.assertEqual(0, load_state(data))
+
+        data = json.loads(json.dumps(data))
+        data['plugins'][pythonpath]['status'] = DISABLED
+        data['plugins'][pythonpath]['scopes'] = {'site:1': ENABLED}
+        data['plugins']['djangoplugins.tests.MyPlugin']['status'] = DISABLED
+        data['points'][point]['title'] = 'Point'
+        disabled = []
+
+        def receiver(sender, plugin, **kwargs):
+            disabled.append(type(plugin))
+        django_plugin_disabled.connect(receiver)
+        try:
+            self.assertEqual(3, load_state(data))
+        finally:
+            django_plugin_disabled.disconnect(receiver)
+
+        self.assertEqual(set([MyPlugin, MyPlugin2]), set(disabled))
+        self.assertEqual(DISABLED, MyPlugin2.get_model().status)
+        self.assertEqual('Point', MyPluginPoint.get_model().title)
+        self.assertEqual(['my-plugin-full', 'my-plugin-2'], [
+            i.name for i in MyPluginPoint.get_plugins(scope='site:1')])
+        self.assertEqual(data, json.loads(json.dumps(dump_state())))
+
+    def test_load_unchanged(self):
+        PluginScopeStatus.objects.create(plugin=MyPlugin2.get_model(),
+                                         scope='site:1', status=DISABLED)
+        PluginScopeStatus.objects.create(plugin=MyPlugin.get_model(),
+                                         scope='site:1', status=DISABLED)
+        data = dump_state()
+        version = get_version()
+        changes = PluginChange.objects.count()
+        self.assertEqual(0, load_state(data))
+        self.assertEqual(version, get_version())
+        self.assertEqual(changes, PluginChange.objects.count())
+
+        pythonpath = 'djangoplugins.tests.MyPlugin2'
+        data['plugins'][pythonpath]['scopes'] = {'site:2': DISABLED}
+        data['plugins']['djangoplugins.tests.MyPlugin']['scopes'] = {
+            'site:1': ENABLED}
+        load_state(data)
+        self.assertNotEqual(version, get_version())
+        self.assertEqual(changes + 1, PluginChange.objects.count())
+        self.assertEqual(data, dump_state())
+
+    def test_load_new(self):
+        data = dump_state()
+        Plugin.objects.all().delete()
+        PluginPointModel.objects.all().delete()
+        load_state(data)
+        self.assertEqual(data, dump_state())
+
+
+class SyncLockTest(TestCase):
+    def test_lock(self):
+        SyncPlugins(False, 0).all()
+        self.assertEqual(['syncplugins'], [
+            i.name for i in PluginLock.objects.exclude(locked=None)])
+
+    def test_waited(self):
+        Plugin.objects.filter(pythonpath='djangoplugins.tests.MyPlugin2').\
+            update(title='Changed')
+        acquire = PluginLock.objects.acquire
+        PluginLock.objects.acquire = lambda name: False
+        try:
+            SyncPlugins(False, 0).all()
+        finally:
+            PluginLock.objects.acquire = acquire
+        self.assertEqual('Changed', MyPlugin2.get_model().title)
+
+        SyncPlugins(False, 0).all()
+        self.assertEqual('My Plugin 2', MyPlugin2.get_model().title)
+
+
+class PluginURLsTest(TestCase):
+    def test_reverse(self):
+        class urlconf:
+            urlpatterns = [
+                url(r'^plugins/', include_plugins(MyPluginPoint,
+                                                  namespace='{plugin}')),
+            ]
+
+        with override_settings(ROOT_URLCONF=urlconf):
+            self.assertEqual('/plugins/my-plugin-2/',
+                             MyPluginPoint.reverse('my-plugin-2', 'detail'))
+            self.assertEqual('/plugins/my-plugin-2/',
+                             MyPluginPoint.reverse(MyPlugin2(), 'detail'))
+            self.assertEqual(b'my-plugin-2',
+                             self.client.get('/plugins/my-plugin-2/').content)
+            self.assertRaises(NoReverseMatch, MyPluginPoint.reverse,
+                              'my-plugin', 'detail')
+            self.assertEqual('/plugins/my-plugin-2/5/', MyPluginPoint.reverse(
+                'my-plugin-2', 'item', kwargs={'pk': 5}))
+            self.assertEqual('/plugins/my-plugin-2/5/', MyPluginPoint.reverse(
+                'my-plugin-2', 'item', args=[5]))
+            self.assertRaises(NoReverseMatch, MyPluginPoint.reverse,
+                              'my-plugin-2', 'item', args=['x'])
+            self.assertEqual(2, len([key for key in url_templates
+                                     if key[0] is urlconf]))
+
+
+@override_settings(DJANGOPLUGINS_BREAKER={'min_calls': 2, 'cooldown': 60})
+class CircuitBreakerTest(TestCase):
+    def setUp(self):
+        breakers.reset()
+        logging.getLogger('djangoplugins').disabled = True
+
+    def tearDown(self):
+        logging.getLogger('djangoplugins').disabled = False
+
+    def test_breaker(self):
+        pythonpath = 'djangoplugins.tests.MyPlugin2'
+        self.assertEqual([], MyPluginPoint.dispatch('fail'))
+        self.assertFalse(breakers.get_state()[pythonpath]['open'])
+        self.assertEqual([], MyPluginPoint.dispatch('fail'))
+        self.assertEqual({'open': True, 'calls': 2, 'failures': 2},
+                         dict((k, v) for k, v in six.iteritems(
+                             breakers.get_state()[pythonpath])
+                             if k != 'mean'))
+        # Tripped plugin is skipped, without changing its status.
+        self.assertEqual([], MyPluginPoint.dispatch('fail', (False,)))
+        self.assertTrue(MyPlugin2.is_active())
+
+        bump_version()
+        self.assertEqual({}, breakers.get_state())
+        results = MyPluginPoint.dispatch('fail', kwargs={'fail': False})
+        self.assertEqual([(MyPlugin2, 'ok')],
+                         [(type(i), r) for i, r in results])
+
+    def test_version_checked_once(self):
+        calls = []
+        get_version = breaker.get_version
+
+        def counting_get_version():
+            calls.append(None)
+            return get_version()
+        breaker.get_version = counting_get_version
+        try:
+            MyPluginPoint.dispatch('is_active')
+        finally:
+            breaker.get_version = get_version
+        self.assertEqual(1, len(calls))
+
+    def test_budget(self):
+        self.assertEqual([], MyPluginPoint.dispatch('fail', (False,),
+                                                    budget=0))
+
+    @override_settings(DJANGOPLUGINS_BREAKER=None)
+    def test_disabled(self):
+        self.assertRaises(ValueError, MyPluginPoint.dispatch, 'fail')
+
+
+class RegistryVersionTest(TransactionTestCase):
+    # Version is bumped on commit, which TestCase never does.
+    serialized_rollback = True
+
+    def test_bumped_on_commit(self):
+        version = get_version()
+        with transaction.atomic():
+            model = MyPlugin.get_model()
+            model.status = DISABLED
+            model.save()
+            Plugin.objects.set_status(
+                Plugin.objects.filter(pk=MyPlugin2.get_model().pk), DISABLED)
+            Plugin.objects.reorder(Plugin.objects.all())
+            self.assertEqual(version, get_version())
+        self.assertNotEqual(version, get_version())
+
+    def test_rolled_back(self):
+        version = get_version()
+        try:
+            with transaction.atomic():
+                model = MyPlugin.get_model()
+                model.status = DISABLED
+                model.save()
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual(version, get_version())
+        self.assertTrue(MyPlugin.is_active())
+
+
+@override_settings(DJANGOPLUGINS_DEFER_SIGNALS=True)
+class DeferredSignalsTest(TransactionTestCase):
+    # Signals are sent on commit, which TestCase never does.
+    serialized_rollback = True
+
+    def setUp(self):
+        self.disabled, self.enabled = [], []
+        django_plugin_disabled.connect(self.on_disabled)
+        django_plugin_enabled.connect(self.on_enabled)
+
+    def tearDown(self):
+        django_plugin_disabled.disconnect(self.on_disabled)
+        django_plugin_enabled.disconnect(self.on_enabled)
+
+    def on_disabled(self, sender, plugin, **kwargs):
+        self.disabled.append(type(plugin))
+
+    def on_enabled(self, sender, plugin, **kwargs):
+        self.enabled.append(type(plugin))
+
+    def test_deferred(self):
+        with transaction.atomic():
+            Plugin.objects.set_status(
+                Plugin.objects.filter(pythonpath__in=[
+                    'djangoplugins.tests.MyPlugin',
+                    'djangoplugins.tests.MyPlugin2']), DISABLED)
+            model = MyPlugin2.get_model()
+            model.status = ENABLED
+            model.save()
+            self.assertEqual([], self.disabled + self.enabled)
+        self.assertEqual([MyPlugin], self.disabled)
+        self.assertEqual([MyPlugin2], self.enabled)
+
+    def test_rolled_back(self):
+        with transaction.atomic():
+            model = MyPlugin.get_model()
+            model.status = DISABLED
+            model.save()
+            try:
+                with transaction.atomic():
+                    model = MyPlugin2.get_model()
+                    model.status = DISABLED
+                    model.save()
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual([MyPlugin], self.disabled)
+
+        with transaction.atomic():
+            model = MyPlugin2.get_model()
+            model.status = DISABLED
+            model.save()
+            try:
+                with transaction.atomic():
+                    model.status = ENABLED
+                    model.save()
+                    raise ValueError
+            except ValueError:
+                pass
+        self.assertEqual([MyPlugin, MyPlugin2], self.disabled)
+        self.assertEqual([], self.enabled)
+
+        try:
+            with transaction.atomic():
+                model = MyPluginFull.get_model()
+                model.status = DISABLED
+                model.save()
+                raise ValueError
+        except ValueError:
+            pass
+        self.assertEqual([MyPlugin, MyPlugin2], self.disabled)
+
+    def test_autocommit(self):
+        statuses = []
+
+        def on_disabled(sender, plugin, **kwargs):
+            statuses.append(plugin.get_model().status)
+        django_plugin_disabled.connect(on_disabled)
+        try:
+            model = MyPlugin.get_model()
+            model.status = DISABLED
+            model.save()
+        finally:
+            django_plugin_disabled.disconnect(on_disabled)
+        self.assertEqual([DISABLED], statuses)
+
+    @override_settings(DJANGOPLUGINS_DEFER_SIGNALS=False,
+                       DJANGOPLUGINS_SIGNAL_WORKERS=1)
+    def test_workers(self):
+        model = MyPlugin2.get_model()
+        model.status = DISABLED
+        model.save()
+        signals.workers.queue.join()
+        self.assertEqual([MyPlugin2], self.disabled)
+
+
+class PluginConfigTest(TransactionTestCase):
+    serialized_rollback = True
+
+    def test_config(self):
+        self.assertEqual({}, MyPlugin2().get_config())
+        model = MyPlugin2.get_model()
+        model.set_config({'size': 3})
+        self.assertEqual({'size': 3}, MyPlugin2().get_config())
+        self.assertEqual({'size': 3},
+                         MyPluginPoint.get_plugin('my-plugin-2').get_config())
+
+        model.config = '{'
+        self.assertRaises(ValidationError, model.full_clean)
+        model.config = '[]'
+        self.assertRaises(ValidationError, model.full_clean)
+
+    @skipIf(jsonschema is None, 'jsonschema is not installed')
+    def test_config_schema(self):
+        model = MyPluginFull.get_model()
+        self.assertRaises(ValidationError, model.set_config, {})
+        model.set_config({'size': 1})
+        model.full_clean()
+
+    @override_settings(DJANGOPLUGINS_REGISTRY_CACHE=True)
+    def test_config_cached(self):
+        registry.clear()
+        model = MyPlugin2.get_model()
+        model.set_config({'size': 3})
+        registry.warm_up()
+        with self.assertNumQueries(0):
+            for plugin in MyPluginPoint.get_plugins():
+                if isinstance(plugin, MyPlugin2):
+                    self.assertEqual({'size': 3}, plugin.get_config())
+        model.set_config({'size': 4})
+        self.assertEqual({'size': 4}, MyPlugin2().get_config())
+        registry.clear()
@@ -1,12 +1,33 @@
 from __future__ import absolute_import
 
+import re
+import threading
+import time
+from collections import OrderedDict
+
+from django import VERSION as django_version
 from django.db import connection
 from django.conf import settings
 from django.conf.urls import include, url
+from django.utils import six
+from django.utils.encoding import force_text
+
+try:
+    from django.urls import get_resolver
+    from django.urls.resolvers import get_ns_resolver
+except ImportError:  # Django < 1.10
+    from django.core.urlresolvers import get_resolver, get_ns_resolver
 
 from importlib import import_module
 
 
+def get_setting(name, default=None):
+    """
+    Returns ``DJANGOPLUGINS_<name>`` setting value or ``default``.
+    """
+    return getattr(settings, 'DJANGOPLUGINS_%s' % name, default)
+
+
 def get_plugin_name(cls):
     return "%s.%s" % (cls.__module__, cls.__name__)
 
@@ -25,16 +46,111 @@ def get_plugin_from_string(plugin_name):
     return getattr(module, classname)
 
 
-def include_plugins(point, pattern=r'{plugin}/', urls='urls'):
+# Namespaced URL names by plugin point pythonpath and (plugin name, URL
+# name), collected by include_plugins.
+url_names = {}
+
+# URLTemplate lists by (URLconf, namespaced URL name).
+url_templates = {}
+
+
+class URLTemplate(object):
+    """
+    One way to build path of a URL pattern, prebuilt from URLconf, so that
+    reversing it is string formatting and a regular expression match, as in
+    Django's resolver, but without looking the pattern up.
+    """
+
+    def __init__(self, result, params, pattern, defaults):
+        self.result = result
+        self.params = params
+        self.defaults = defaults
+        self.regex = re.compile('^%s' % pattern, re.UNICODE)
+
+    def format(self, args, kwargs):
+        """
+        Returns path (without script prefix) for ``args`` or ``kwargs`` or
+        ``None``, if they do not match the pattern.
+        """
+        if args:
+            if len(args) != len(self.params):
+                return None
+            subs = dict(zip(self.params, [force_text(i) for i in args]))
+        else:
+            if set(kwargs) | set(self.defaults) != \
+                    set(self.params) | set(self.defaults):
+                return None
+            if any(kwargs.get(k, v) != v
+                   for k, v in six.iteritems(self.defaults)):
+                return None
+            subs = dict((k, force_text(v)) for k, v in six.iteritems(kwargs))
+        path = self.result % subs
+        if not self.regex.search(path):
+            return None
+        return path
+
+
+def get_url_templates(view_name, urlconf):
+    """
+    Returns ``URLTemplate`` list of namespaced URL ``view_name`` of
+    ``urlconf``, walking URL namespaces only on first use. Raises
+    ``KeyError``, if namespace is not included.
+    """
+    key = (urlconf, view_name)
+    try:
+        return url_templates[key]
+    except KeyError:
+        pass
+    path = view_name.split(':')
+    resolver = get_resolver(urlconf)
+    ns_pattern = ''
+    for namespace in path[:-1]:
+        extra, resolver = resolver.namespace_dict[namespace]
+        ns_pattern += extra
+    if ns_pattern:
+        resolver = get_ns_resolver(ns_pattern, resolver)
+    templates = url_templates[key] = [
+        URLTemplate(result, params, pattern, defaults)
+        for possibility, pattern, defaults in
+        resolver.reverse_dict.getlist(path[-1])
+        for result, params in possibility]
+    return templates
+
+
+def include_plugins(point, pattern=r'{plugin}/', urls='urls',
+                    namespace=None):
+    """
+    Includes ``urls`` of each enabled plugin of ``point`` under ``pattern``.
+
+    If ``namespace`` is given, for example ``'{plugin}'``, urls of each plugin
+    are included in their own URL namespace, formatted with plugin name, and
+    can be reversed with ``point.reverse(plugin, name)``.
+    """
     pluginurls = []
-    for plugin in point.get_plugins():
-        if hasattr(plugin, urls) and hasattr(plugin, 'name'):
+    names = url_names.setdefault(get_plugin_name(point), {})
+    for plugin in point.get_plugins(implementing=urls):
+        if hasattr(plugin, 'name'):
             _urls = getattr(plugin, urls)
             for _url in _urls:
                 _url.default_args['plugin'] = plugin.name
+            if namespace is None:
+                pluginurls.append(url(
+                    pattern.format(plugin=plugin.name),
+                    include(_urls)
+                ))
+                continue
+            _namespace = namespace.format(plugin=plugin.name)
+            for _url in _urls:
+                if getattr(_url, 'name', None):
+                    names[(plugin.name, _url.name)] = '%s:%s' % (_namespace,
+                                                                 _url.name)
+            if django_version >= (1, 9):
+                _include = include((_urls, _namespace))
+            else:
+                _include = include(_urls, namespace=_namespace)
             pluginurls.append(url(
                 pattern.format(plugin=plugin.name),
-                include(_urls)
+                _include
             ))
     return include(pluginurls)
 
@@ -63,5 +179,73 @@ def load_plugins():
             import_app(app)
 
 
+_existing_tables = set()
+
+
 def db_table_exists(table_name):
-    return table_name in connection.introspection.table_names()
+    # Tables are not dropped while running, so only existing tables are
+    # remembered, saving an introspection query on each call.
+    if table_name in _existing_tables:
+        return True
+    exists = table_name in connection.introspection.table_names()
+    if exists:
+        _existing_tables.add(table_name)
+    return exists
+
+
+_existing_columns = set()
+
+
+def db_column_exists(table_name, column_name):
+    # Same as db_table_exists(), for columns added by later migrations.
+    if (table_name, column_name) in _existing_columns:
+        return True
+    if not db_table_exists(table_name):
+        return False
+    with connection.cursor() as cursor:
+        exists = column_name in [
+            column[0] for column in
+            connection.introspection.get_table_description(cursor,
+                                                           table_name)]
+    if exists:
+        _existing_columns.add((table_name, column_name))
+    return exists
+
+
+class LRUCache(object):
+    """
+    Thread safe mapping, which keeps at most ``maxsize`` least recently used
+    items, each for at most ``ttl`` seconds, if given.
+    """
+
+    def __init__(self, maxsize=1000, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.items = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                expires, value = self.items.pop(key)
+            except KeyError:
+                return default
+            if expires is not None and expires < time.time():
+                return default
+            self.items[key] = (expires, value)
+            return value
+
+    def set(self, key, value):
+        expires = None if self.ttl is None else time.time() + self.ttl
+        with self.lock:
+            self.items.pop(key, None)
+            self.items[key] = (expires, value)
+            while len(self.items) > self.maxsize:
+                self.items.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def __len__(self):
+        return len(self.items)
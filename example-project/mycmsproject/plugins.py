@@ -1,7 +1,6 @@
 from __future__ import absolute_import
 
 from django.conf.urls import url
-from django.core.urlresolvers import reverse
 
 from djangoplugins.point import PluginPoint
 
@@ -20,10 +19,10 @@ class ContentType(PluginPoint):
     ]
 
     def get_list_url(self):
-        return reverse('content-list')
+        return ContentType.reverse(self, 'content-list')
 
     def get_create_url(self):
-        return reverse('content-create')
+        return ContentType.reverse(self, 'content-create')
 
     def get_read_url(self, content):
-        return reverse('content-read', args=[content.pk])
+        return ContentType.reverse(self, 'content-read', args=[content.pk])
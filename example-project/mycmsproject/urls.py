@@ -22,8 +22,9 @@ from .views import index
 
 urlpatterns = [
     url(r'^$', index, name='index'),
-    url(r'^content/', include_plugins(ContentType)),
+    url(r'^content/', include_plugins(ContentType, namespace='{plugin}')),
     url(r'^content/', include_plugins(
-        ContentType, '{plugin}/(?P<pk>\d+)/', 'instance_urls'
+        ContentType, '{plugin}/(?P<pk>\d+)/', 'instance_urls',
+        namespace='{plugin}-instance'
     )),
 ]
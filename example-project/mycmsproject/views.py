@@ -13,7 +13,7 @@ def index(request):
 
 def content_list(request, plugin):
     return render(request, 'content/list.html', {
-        'plugin': mycmsproject.plugins.ContentType.get_plugin(plugin),
+        'plugin': mycmsproject.plugins.ContentType.get_plugin_or_404(plugin),
         'posts': mycmsproject.models.Content.objects.all(),
     })
 
@@ -22,7 +22,7 @@ def content_create(request, plugin):
     # Break circular import
     import mycmsproject.forms
 
-    plugin = mycmsproject.plugins.ContentType.get_plugin(plugin)
+    plugin = mycmsproject.plugins.ContentType.get_plugin_or_404(plugin)
     if request.method == 'POST':
         form = mycmsproject.forms.ContentForm(request.POST)
         if form.is_valid():
@@ -40,7 +40,7 @@ def content_create(request, plugin):
 
 
 def content_read(request, pk, plugin):
-    plugin = mycmsproject.plugins.ContentType.get_plugin(plugin)
+    plugin = mycmsproject.plugins.ContentType.get_plugin_or_404(plugin)
     content = get_object_or_404(mycmsproject.models.Content,
                                 pk=pk, plugin=plugin.get_model())
     return render(request, 'content/read.html', {
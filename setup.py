@@ -32,6 +32,9 @@ setup(name='django-plugins',
           'django>=1.6',
           'django-dirtyfields<1.3',
       ],
+      extras_require={
+          'config': ['jsonschema'],
+      },
       url='https://github.com/krischer/django-plugins',
       download_url='http://pypi.python.org/pypi/django-plugins',
       license='LGPL',